@@ -0,0 +1,87 @@
+"""
+Single-pass aggregation over issues. Analyzers describe the aggregates
+they need as Accumulators; an AggregationPipeline feeds every issue (and
+each of its events) to all registered accumulators in one pass, so
+running several analyzers together does not iterate the issues once per
+analyzer.
+"""
+
+from typing import Dict, Iterable
+
+import profiler
+from model import Event, Issue
+
+
+class Accumulator:
+    """
+    Collects one aggregate from a stream of issues. Subclasses that need
+    the events of each issue set wants_events and implement add_event().
+    """
+
+    wants_events:bool = False
+
+    def add(self, issue:Issue):
+        pass
+
+    def add_event(self, issue:Issue, event:Event):
+        pass
+
+    def result(self) -> any:
+        raise NotImplementedError
+
+
+class AggregationPipeline:
+    """
+    Runs a set of named accumulators over the issues in a single pass.
+    Accumulators registered under the same name are computed only once
+    and their result is shared.
+    """
+
+    def __init__(self, accumulators:Dict[str, Accumulator]=None):
+        self.accumulators:Dict[str, Accumulator] = {}
+        if accumulators:
+            self.register(accumulators)
+
+    def register(self, accumulators:Dict[str, Accumulator]):
+        for name, accumulator in accumulators.items():
+            self.accumulators.setdefault(name, accumulator)
+
+    def feed(self, issues:Iterable[Issue]):
+        """
+        Feeds all issues (and their events) to the accumulators in one pass.
+        """
+        accumulators = list(self.accumulators.values())
+        event_accumulators = [a for a in accumulators if a.wants_events]
+        with profiler.stage('aggregate') as stage:
+            count = 0
+            for issue in issues:
+                count += 1
+                for accumulator in accumulators:
+                    accumulator.add(issue)
+                if event_accumulators:
+                    for event in issue.events:
+                        for accumulator in event_accumulators:
+                            accumulator.add_event(issue, event)
+            stage.count(count)
+
+    def finalize(self, name:str) -> any:
+        """
+        Returns the result of one accumulator.
+        """
+        with profiler.stage(f'aggregate.{name}'):
+            return self.accumulators[name].result()
+
+    def run(self, issues:Iterable[Issue]) -> Dict[str, any]:
+        """
+        Feeds all issues to the accumulators and returns their results
+        by name.
+        """
+        self.feed(issues)
+        return {name: self.finalize(name) for name in self.accumulators}
+
+
+def accumulate(accumulator:Accumulator, issues:Iterable[Issue]) -> any:
+    """
+    Runs a single accumulator over the issues and returns its result.
+    """
+    return AggregationPipeline({'result': accumulator}).run(issues)['result']
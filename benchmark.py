@@ -0,0 +1,510 @@
+"""
+Micro-benchmarks for the data loading pipeline. Run with e.g.
+
+    python benchmark.py timestamps
+    python benchmark.py memory
+    python benchmark.py pipeline
+    python benchmark.py events
+    python benchmark.py suite --sizes 10000,100000,1000000
+
+By default the benchmarks use the data file configured through
+ENPM611_PROJECT_DATA_PATH. The suite instead generates synthetic
+datasets of the given sizes (see synthetic_data.py) and writes its
+results as JSON so that runs can be compared over time.
+"""
+
+import argparse
+import contextlib
+import gc
+import hashlib
+import io
+import json
+import os
+import platform
+import re
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from dateutil import parser
+
+import config
+import timestamps
+from aggregation import AggregationPipeline, accumulate
+from model import Event, Issue, State
+from synthetic_data import SyntheticDataset
+
+
+def _time(fn:Callable, repeat:int) -> float:
+    """
+    Returns the best wall time (in seconds) of several runs of fn.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _collect_timestamps(data_path:str) -> List[str]:
+    """
+    Returns every raw timestamp string contained in the data file.
+    """
+    with open(data_path, 'r') as fin:
+        jissues = json.load(fin)
+    values = []
+    for jissue in jissues:
+        values.append(jissue.get('created_date'))
+        values.append(jissue.get('updated_date'))
+        for jevent in jissue.get('events', []):
+            values.append(jevent.get('event_date'))
+    return [v for v in values if v is not None]
+
+
+def bench_timestamps(data_path:str, repeat:int=3):
+    """
+    Compares dateutil's generic parser with timestamps.parse_timestamp
+    on all timestamps of the dataset.
+    """
+    values = _collect_timestamps(data_path)
+
+    def with_dateutil():
+        for v in values:
+            parser.parse(v)
+
+    def with_fast_path():
+        for v in values:
+            timestamps.parse_timestamp(v)
+
+    timestamps.stats.reset()
+    # Both paths must agree before their speed is worth comparing
+    mismatches = sum(1 for v in values if parser.parse(v) != timestamps.parse_timestamp(v))
+
+    slow = _time(with_dateutil, repeat)
+    timestamps.stats.reset()
+    fast = _time(with_fast_path, repeat)
+
+    print(f'Timestamps: {len(values)} (mismatches: {mismatches})')
+    print(f'dateutil.parser.parse:      {slow:.3f} s')
+    print(f'timestamps.parse_timestamp: {fast:.3f} s ({slow / fast:.1f}x faster)')
+    print(f'Decoding paths per run: {timestamps.stats.fast // repeat} fast, '
+          f'{timestamps.stats.fallback // repeat} fallback, {timestamps.stats.failed // repeat} failed')
+
+
+class _DictEvent:
+    """
+    Event as it was stored before __slots__ and string interning, used
+    as the baseline of the memory benchmark.
+    """
+
+    def __init__(self, jobj:any):
+        self.event_type = jobj.get('event_type')
+        self.author = jobj.get('author')
+        self.event_date = timestamps.parse_timestamp(jobj.get('event_date'))
+        self.label = jobj.get('label')
+        self.comment = jobj.get('comment')
+
+
+class _DictIssue:
+    """
+    Issue as it was stored before __slots__ and string interning, used
+    as the baseline of the memory benchmark.
+    """
+
+    def __init__(self, jobj:any):
+        self.url = jobj.get('url')
+        self.creator = jobj.get('creator')
+        self.labels = jobj.get('labels', [])
+        self.state = State[jobj.get('state')]
+        self.assignees = jobj.get('assignees', [])
+        self.title = jobj.get('title')
+        self.text = jobj.get('text')
+        self.number = int(jobj.get('number', '-1'))
+        self.created_date = timestamps.parse_timestamp(jobj.get('created_date'))
+        self.updated_date = timestamps.parse_timestamp(jobj.get('updated_date'))
+        self.timeline_url = jobj.get('timeline_url')
+        self.events = [_DictEvent(jevent) for jevent in jobj.get('events', [])]
+
+
+def _retained_bytes(data_path:str, build:Callable) -> int:
+    """
+    Returns the memory still allocated after build() has turned the
+    parsed JSON into objects and the JSON itself has been released.
+    """
+    gc.collect()
+    tracemalloc.start()
+    with open(data_path, 'r') as fin:
+        objs = build(json.load(fin))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return size
+
+
+def bench_memory(data_path:str, repeat:int=1):
+    """
+    Reports the bytes retained per issue and per event with the plain
+    __dict__-based model and with the compact model in model.py.
+    """
+    with open(data_path, 'r') as fin:
+        jissues = json.load(fin)
+    n_issues = len(jissues)
+    n_events = sum(len(jissue.get('events', [])) for jissue in jissues)
+    del jissues
+
+    print(f'Issues: {n_issues}, events: {n_events}')
+    for name, issue_cls, event_cls in (('__dict__', _DictIssue, _DictEvent),
+                                       ('__slots__ + intern', Issue, Event)):
+        events = _retained_bytes(data_path, lambda jissues: [
+            event_cls(jevent) for jissue in jissues for jevent in jissue.get('events', [])])
+        # Lazily loaded events are materialized so both models hold Event objects
+        total = _retained_bytes(data_path, lambda jissues: [
+            issue for issue in (issue_cls(jissue) for jissue in jissues) if issue.events is not None])
+        per_event = events / max(n_events, 1)
+        per_issue = (total - events) / max(n_issues, 1)
+        print(f'{name:>20}: {per_issue:8.0f} bytes/issue (excl. events), '
+              f'{per_event:6.0f} bytes/event, {total / 2**20:8.1f} MiB total')
+
+
+class _CountingIssues:
+    """
+    Wraps a list of issues and counts how often it is iterated.
+    """
+
+    def __init__(self, issues:List[Issue]):
+        self.issues = issues
+        self.passes = 0
+
+    def __iter__(self):
+        self.passes += 1
+        return iter(self.issues)
+
+    def __len__(self):
+        return len(self.issues)
+
+
+def _load_issues(data_path:str) -> List[Issue]:
+    with open(data_path, 'r') as fin:
+        return [Issue(jissue) for jissue in json.load(fin)]
+
+
+def _pre_pipeline_passes(issues) -> int:
+    """
+    Replays the aggregation loops of the analyzers as they were before
+    the shared pipeline existed: every analyzer walked the issues once
+    per aggregate, and the contributor analyzer recomputed its two
+    aggregates for the console output and again for each chart. Returns
+    a checksum so the loops cannot be optimized away.
+    """
+    checksum = 0
+
+    # ContributorActivityAnalyzer: run(), print*() and plot*() each
+    # recomputed the active counts and the type distribution
+    for _ in range(3):
+        active = defaultdict(int)
+        for issue in issues:
+            if issue.state == State.open:
+                for contributor in issue.assignees:
+                    active[contributor['login']] += 1
+        distribution = defaultdict(lambda: defaultdict(int))
+        for issue in issues:
+            kinds = [label.split('/')[1] for label in issue.labels if label.startswith('kind/')]
+            for contributor in issue.assignees:
+                for kind in kinds:
+                    distribution[contributor['login']][kind] += 1
+        checksum += len(active) + len(distribution)
+
+    # ResponseResolutionAnalyzer: first response and resolution times
+    response = {}
+    for issue in issues:
+        if not issue.events or not issue.created_date:
+            continue
+        comment_times = [e.event_date for e in issue.events
+                         if e.event_type and e.event_type.lower() == 'commented']
+        if comment_times:
+            response[issue.number] = (min(comment_times) - issue.created_date).total_seconds() / 3600
+    resolution = {}
+    for issue in issues:
+        if issue.created_date and issue.updated_date and issue.state == State.closed:
+            resolution[issue.number] = (issue.updated_date - issue.created_date).total_seconds() / 3600
+    checksum += len(response) + len(resolution)
+
+    # ContentTextAnalyzer: sentiment (texts only, see bench_pipeline),
+    # word cloud text, top keywords and error lines
+    texts = [issue.text or '' for issue in issues]
+    wordcloud_text = ' '.join(issue.text or '' for issue in issues)
+    keywords = Counter(re.findall(r'\b[a-zA-Z]{3,}\b',
+                                  ' '.join(issue.text or '' for issue in issues).lower()))
+    errors = Counter()
+    for issue in issues:
+        for line in (issue.text or '').splitlines():
+            if 'error' in line.lower() or 'exception' in line.lower():
+                errors[line.strip()] += 1
+    checksum += len(texts) + len(wordcloud_text) + len(keywords) + len(errors)
+
+    # LabelAnalyzer: kind, area and prefix counts
+    for matches, key in ((lambda label: label.startswith('kind/'), lambda label: label),
+                         (lambda label: label.startswith('area/'), lambda label: label),
+                         (lambda label: '/' in label, lambda label: label.split('/')[0])):
+        counts = Counter()
+        for issue in issues:
+            for label in issue.labels:
+                if matches(label):
+                    counts[key(label)] += 1
+        checksum += len(counts)
+    return checksum
+
+
+def bench_pipeline(data_path:str, repeat:int=1):
+    """
+    Compares the aggregation passes the analyzers of the combined report
+    made before the shared pipeline (one or more loops per aggregate,
+    see _pre_pipeline_passes) with the single pipeline pass they make now.
+    Only the aggregation is timed: printing, charts, the word cloud's own
+    tokenizing and the interactive contributor summary are not, and
+    sentiment scoring is left out of both modes because TextBlob costs
+    the same per text either way (the texts are still collected).
+    Events are materialized up front so neither mode pays for parsing them.
+    """
+    # Imported here so the loading benchmarks do not pay for matplotlib etc.
+    from content_text_analyzer import ContentTextAnalyzer
+    from contributor_activity_analyzer import ContributorActivityAnalyzer
+    from label_analyzer import LabelAnalyzer
+    from response_resolution_analyzer import ResponseResolutionAnalyzer
+
+    issues = _materialize_events(_load_issues(data_path))
+    analyzers = [ContributorActivityAnalyzer(), ResponseResolutionAnalyzer(),
+                 ContentTextAnalyzer(), LabelAnalyzer()]
+
+    def single_pass(counting:_CountingIssues):
+        pipeline = AggregationPipeline()
+        for analyzer in analyzers:
+            pipeline.register(analyzer.accumulators())
+        pipeline.feed(counting)
+        for name in pipeline.accumulators:
+            if name != 'sentiment':
+                pipeline.finalize(name)
+
+    print(f'Issues: {len(issues)}')
+    for name, fn in (('pre-pipeline', _pre_pipeline_passes), ('single pass', single_pass)):
+        counting = _CountingIssues(issues)
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = _time(lambda: fn(counting), repeat)
+        print(f'{name:>12}: {counting.passes // repeat} pass(es) over the issues, {elapsed:.3f} s')
+
+
+def _materialize_events(issues:List[Issue]) -> List[Issue]:
+    for issue in issues:
+        issue.event_index
+    return issues
+
+
+def bench_events(data_path:str, repeat:int=3):
+    """
+    Compares loading with events materialized eagerly (as Issue.from_json
+    used to do) with the default lazy loading, for the load alone and for
+    a load followed by the label analysis, which never reads events.
+    Also reports the memory retained by the loaded issues.
+    """
+    from issue_frames import IssueFrames
+    from label_analyzer import LabelAnalyzer
+
+    with open(data_path, 'r') as fin:
+        jissues = json.load(fin)
+    n_events = sum(len(jissue.get('events') or []) for jissue in jissues)
+    print(f'Issues: {len(jissues)}, events: {n_events}')
+
+    def labels(issues:List[Issue]):
+        LabelAnalyzer().analyze_kind_labels(IssueFrames.from_issues(issues))
+
+    for name, build in (('eager', lambda jissues: _materialize_events([Issue(j) for j in jissues])),
+                        ('lazy', lambda jissues: [Issue(j) for j in jissues])):
+        load = _time(lambda: build(jissues), repeat)
+        load_labels = _time(lambda: labels(build(jissues)), repeat)
+        retained = _retained_bytes(data_path, build)
+        print(f'{name:>6}: load {load:.3f} s, load + label analysis {load_labels:.3f} s, '
+              f'{retained / 2**20:.1f} MiB retained')
+
+
+def _dataset_path(dataset:SyntheticDataset, directory:str) -> str:
+    """
+    Returns the file of a synthetic dataset, generating it first if it
+    does not exist yet. Files are named after their parameters.
+    """
+    params = json.dumps(dataset.to_dict(), sort_keys=True)
+    digest = hashlib.sha1(params.encode('utf-8')).hexdigest()[:10]
+    path = os.path.join(directory, f'synthetic_{dataset.issues}_{digest}.json')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        print(f'Generating {dataset.issues} synthetic issues in {path}...')
+        dataset.write(path)
+    return path
+
+
+def _suite_for_dataset(data_path:str, repeat:int, sentiment_sample:int) -> Dict[str, dict]:
+    """
+    Times each stage of the application on one dataset. Returns the best
+    wall time and the number of items processed per stage.
+    """
+    import issue_cache
+    import sentiment
+    from content_text_analyzer import TextStatsAccumulator
+    from contributor_activity_analyzer import ContributorActivityAnalyzer
+    from json_stream import iter_json_array
+    from issue_frames import IssueFrames
+    from label_analyzer import LabelAnalyzer
+    from pdf_report_exporter import PDFReportExporter
+    from response_resolution_analyzer import FirstResponseTimeAccumulator, ResponseResolutionAnalyzer
+
+    results = {}
+
+    def bench(name:str, fn:Callable, items:int):
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = _time(fn, repeat)
+        results[name] = {'seconds': round(elapsed, 6), 'items': items}
+        print(f'  {name:<36} {elapsed:9.3f} s  {items / elapsed if elapsed else 0:14,.0f} items/s')
+
+    def load_json():
+        with open(data_path, 'r') as fin:
+            return [Issue(jobj) for jobj in iter_json_array(fin)]
+
+    issues = load_json()
+    n_issues = len(issues)
+    bench('load.json', load_json, n_issues)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The binary cache is written next to the data file it belongs to
+        cached_path = os.path.join(directory, os.path.basename(data_path))
+        os.symlink(os.path.abspath(data_path), cached_path)
+        fingerprint = issue_cache.get_fingerprint(cached_path)
+        issue_cache.save_issues(cached_path, fingerprint, issues)
+        bench('load.cache', lambda: issue_cache.load_issues(cached_path, fingerprint), n_issues)
+
+    frames = IssueFrames.from_issues(issues)
+    bench('frames', lambda: IssueFrames.from_issues(issues), n_issues)
+
+    contributors = ContributorActivityAnalyzer
+    bench('contributors.active_issues', lambda: contributors.get_active_issues_count_per_contributor(frames), n_issues)
+    bench('contributors.type_distribution',
+          lambda: contributors.get_issue_type_distribution_per_contributor(frames), n_issues)
+
+    response = ResponseResolutionAnalyzer()
+    bench('response.first_response_times', lambda: accumulate(FirstResponseTimeAccumulator(), issues), n_issues)
+    bench('response.resolution_times', lambda: response.get_resolution_times(frames), n_issues)
+
+    labels = LabelAnalyzer()
+    bench('labels.kind', lambda: labels.analyze_kind_labels(frames), len(frames.labels))
+    bench('labels.area', lambda: labels.analyze_area_labels(frames), len(frames.labels))
+    bench('labels.prefixes', lambda: labels.analyze_label_prefixes(frames), len(frames.labels))
+
+    bench('text.tokenize', lambda: accumulate(TextStatsAccumulator(), issues), n_issues)
+
+    # TextBlob is slow enough that scoring every text would dominate the
+    # suite, so a fixed sample is scored and reported as texts per second
+    texts = [issue.text or '' for issue in issues[:sentiment_sample]]
+    bench('sentiment', lambda: sentiment.score_texts(texts), len(texts))
+
+    report_data = {
+        'Active Issues per Contributor': contributors.get_active_issues_count_per_contributor(frames),
+        'Label: Kind Counts': dict(labels.analyze_kind_labels(frames)),
+        'Label: Area Counts': dict(labels.analyze_area_labels(frames)),
+        'Label: Prefix Breakdown': dict(labels.analyze_label_prefixes(frames)),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = os.path.join(directory, 'report.pdf')
+        bench('pdf.export', lambda: PDFReportExporter('Benchmark Report').export(report_data, filename=pdf_path),
+              sum(len(section) for section in report_data.values()))
+    return results
+
+
+def _compare(results:Dict[str, Dict[str, dict]], baseline_path:str):
+    """
+    Prints the time of each stage relative to an earlier results file.
+    """
+    with open(baseline_path, 'r') as fin:
+        baseline = json.load(fin)['results']
+    print(f'\nCompared with {baseline_path} (ratio > 1 is slower):')
+    for size, stages in results.items():
+        for name, result in stages.items():
+            before = baseline.get(size, {}).get(name)
+            if before and before['seconds']:
+                ratio = result['seconds'] / before['seconds']
+                flag = '  <-- regression' if ratio > 1.1 else ''
+                print(f'  {size:>8} {name:<36} {ratio:6.2f}x{flag}')
+
+
+def bench_suite(data_path:str, repeat:int=1, sizes:List[int]=None, output:str=None,
+                compare:str=None, dataset_dir:str='benchmark_data', sentiment_sample:int=2000):
+    """
+    Runs every stage of the application (loading, each analyzer's
+    aggregation, text tokenization, sentiment and PDF export) on
+    synthetic datasets of the given sizes and writes the results as
+    JSON. The data file from the config is not used.
+    """
+    sizes = sizes or [10000, 100000, 1000000]
+    results = {}
+    for size in sizes:
+        dataset = SyntheticDataset(issues=size)
+        path = _dataset_path(dataset, dataset_dir)
+        print(f'\nIssues: {size}')
+        results[str(size)] = _suite_for_dataset(path, repeat, sentiment_sample)
+        gc.collect()
+
+    summary = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'workers': config.get_worker_count(),
+        'repeat': repeat,
+        'sentiment_sample': sentiment_sample,
+        'dataset': SyntheticDataset().to_dict(),
+        'results': results,
+    }
+    summary['dataset'].pop('issues')
+    output = output or f'benchmark_results_{datetime.now():%Y%m%d_%H%M%S}.json'
+    with open(output, 'w') as fout:
+        json.dump(summary, fout, indent=2)
+    print(f'\nResults written to {output}')
+    if compare:
+        _compare(results, compare)
+
+
+BENCHMARKS = {
+    'timestamps': bench_timestamps,
+    'memory': bench_memory,
+    'pipeline': bench_pipeline,
+    'events': bench_events,
+    'suite': bench_suite,
+}
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser("benchmark.py")
+    ap.add_argument('benchmark', choices=sorted(BENCHMARKS.keys()),
+                    help='Which benchmark to run')
+    ap.add_argument('--data', type=str, required=False,
+                    help='Data file to benchmark against (defaults to ENPM611_PROJECT_DATA_PATH)')
+    ap.add_argument('--repeat', type=int, default=3,
+                    help='Number of timed runs; the best run is reported')
+    ap.add_argument('--sizes', type=str, default='10000,100000,1000000',
+                    help='suite: comma-separated numbers of synthetic issues')
+    ap.add_argument('--output', type=str, required=False,
+                    help='suite: JSON results file (default: benchmark_results_<time>.json)')
+    ap.add_argument('--compare', type=str, required=False,
+                    help='suite: earlier results file to compare against')
+    ap.add_argument('--sentiment_sample', type=int, default=2000,
+                    help='suite: number of texts scored by the sentiment benchmark')
+    args = ap.parse_args()
+    data_path = args.data or config.get_parameter('ENPM611_PROJECT_DATA_PATH')
+    if args.benchmark == 'suite':
+        bench_suite(data_path, repeat=args.repeat, sizes=[int(size) for size in args.sizes.split(',')],
+                    output=args.output, compare=args.compare, sentiment_sample=args.sentiment_sample)
+    else:
+        BENCHMARKS[args.benchmark](data_path, repeat=args.repeat)
@@ -0,0 +1,259 @@
+"""
+Renders the analyzers' charts. Each chart is described by a ChartJob: a
+module-level draw function that builds a matplotlib figure from the
+aggregated data, plus the PNG path to save it to.
+
+By default charts are rendered immediately and shown in a window. In
+headless mode (--headless) the Agg backend is used, nothing is shown,
+and charts are handed to a process pool as soon as they are submitted,
+so they render while the analyzers keep working; render_all() waits for
+them. Figures are always closed after saving.
+
+Rendered charts are kept in a content-addressed ChartCache, keyed by the
+draw function and the plotted data, so unchanged charts are not
+rendered again (only drawn to be shown, when not headless). A copy is
+saved to the chart's own filename as well. The cache keeps the most
+recently used charts up to a maximum number.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional, Set
+
+import matplotlib
+
+import config
+import profiler
+
+DEFAULT_MAX_ENTRIES:int = 500
+
+
+class ChartJob:
+    """
+    A chart to render: draw(**data) must return a matplotlib Figure.
+    draw has to be a module-level function so the job can be sent to a
+    worker process.
+    """
+
+    def __init__(self, draw:Callable, path:str, **data):
+        self.draw:Callable = draw
+        self.path:str = path
+        self.data:dict = data
+        # Where a copy is saved if path was moved into the chart cache
+        self.copy_path:Optional[str] = None
+
+    def key(self) -> str:
+        """
+        Hash of everything that determines the chart's pixels: the code
+        of the draw function, the data and the matplotlib version.
+        """
+        sha = hashlib.sha256()
+        sha.update(f'{self.draw.__module__}.{self.draw.__qualname__}'.encode('utf-8'))
+        sha.update(marshal.dumps(self.draw.__code__))
+        sha.update(matplotlib.__version__.encode('utf-8'))
+        sha.update(json.dumps(self.data, default=repr).encode('utf-8'))
+        return sha.hexdigest()
+
+
+class ChartCache:
+    """
+    Directory of rendered charts named after their ChartJob key. Reused
+    charts are touched, so prune() evicts the least recently used first.
+    """
+
+    def __init__(self, directory:str, max_entries:int=DEFAULT_MAX_ENTRIES):
+        self.directory:str = directory
+        self.max_entries:int = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls) -> Optional['ChartCache']:
+        """
+        Opens the cache configured through ENPM611_PROJECT_CHART_CACHE
+        (a directory, or false to disable). Defaults to .chart_cache in
+        the working directory. ENPM611_PROJECT_CHART_CACHE_SIZE limits
+        the number of charts kept.
+        """
+        directory = config.get_parameter('ENPM611_PROJECT_CHART_CACHE', '.chart_cache')
+        if directory is False:
+            return None
+        max_entries = config.get_parameter('ENPM611_PROJECT_CHART_CACHE_SIZE', DEFAULT_MAX_ENTRIES)
+        try:
+            return cls(directory, int(max_entries))
+        except OSError as e:
+            print(f"Warning: Could not create chart cache {directory}: {e}")
+            return None
+
+    def path_for(self, job:ChartJob) -> str:
+        stem, ext = os.path.splitext(os.path.basename(job.path))
+        return os.path.join(self.directory, f'{stem}-{job.key()[:16]}{ext or ".png"}')
+
+    def reuse(self, path:str) -> bool:
+        """
+        Marks a cached chart as used. Returns False if it is not cached.
+        """
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def prune(self, keep:Set[str]=frozenset()):
+        """
+        Removes the least recently used charts beyond max_entries, except
+        the ones in keep (e.g. charts of the current report).
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            # Temporary files of charts being written are left alone
+            if entry.is_file() and '.tmp' not in entry.name:
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _init_worker():
+    matplotlib.use("Agg")
+
+
+def render_chart(job:ChartJob) -> str:
+    """
+    Draws the chart, saves it and closes the figure. Returns its path.
+    """
+    import matplotlib.pyplot as plt
+    fig = job.draw(**job.data)
+    try:
+        _save(fig, job.path)
+    finally:
+        plt.close(fig)
+    _copy(job)
+    return job.path
+
+
+def _copy(job:ChartJob):
+    if job.copy_path is not None:
+        shutil.copyfile(job.path, job.copy_path)
+
+
+def _save(fig, path:str):
+    # Written under a temporary name first so a cached chart is never partial
+    root, ext = os.path.splitext(path)
+    tmp_path = f'{root}.{os.getpid()}.tmp{ext}'
+    fig.savefig(tmp_path, bbox_inches="tight")
+    os.replace(tmp_path, path)
+
+
+class ChartRenderer:
+
+    def __init__(self, headless:bool=False, workers:int=1, cache:ChartCache=None):
+        self.headless:bool = headless
+        self.workers:int = workers
+        self.cache:Optional[ChartCache] = cache
+        self.pending:List[Future] = []
+        # Charts submitted in this run, which are never evicted from the cache
+        self.paths:Set[str] = set()
+        self._executor:Optional[ProcessPoolExecutor] = None
+        # Analyzers of the combined report may submit from several threads
+        self._lock = threading.Lock()
+        if headless:
+            matplotlib.use("Agg")
+
+    def submit(self, job:ChartJob) -> str:
+        """
+        Renders the chart now (and shows it) or, in headless mode, starts
+        rendering it in the background. Charts found in the cache are not
+        saved again, and in headless mode not rendered at all. Returns
+        the path the chart is saved to, which is inside the cache if
+        caching is enabled; a copy is saved to the job's path then.
+        """
+        cached = False
+        if self.cache is not None:
+            job.copy_path = job.path
+            job.path = self.cache.path_for(job)
+            with self._lock:
+                self.paths.add(job.path)
+            cached = self.cache.reuse(job.path)
+            if cached:
+                print(f"♻️ Reusing cached chart {job.path}")
+                _copy(job)
+                if self.headless:
+                    return job.path
+        if self.headless:
+            with self._lock:
+                self.pending.append(self._dispatch(job))
+            return job.path
+        import matplotlib.pyplot as plt
+        fig = job.draw(**job.data)
+        try:
+            # Time spent looking at the window is not part of the stage
+            if not cached:
+                with profiler.stage('charts') as stage:
+                    stage.count(1)
+                    _save(fig, job.path)
+                _copy(job)
+            plt.show()
+        finally:
+            plt.close(fig)
+        return job.path
+
+    def _dispatch(self, job:ChartJob) -> Future:
+        if self.workers <= 1:
+            future = Future()
+            future.set_result(job)
+            return future
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._executor.submit(render_chart, job)
+
+    def render_all(self) -> List[str]:
+        """
+        Waits for all submitted charts and returns their paths in the
+        order they were submitted.
+        """
+        with self._lock:
+            pending, self.pending = self.pending, []
+            executor, self._executor = self._executor, None
+        try:
+            with profiler.stage('charts') as stage:
+                stage.count(len(pending))
+                # With a single worker the futures hold the jobs, rendered here
+                return [render_chart(result) if isinstance(result, ChartJob) else result
+                        for result in (future.result() for future in pending)]
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if self.cache is not None:
+                self.cache.prune(keep=self.paths)
+
+
+# Shared by all analyzers so the combined report renders its charts together
+_RENDERER:ChartRenderer = None
+
+
+def get_renderer() -> ChartRenderer:
+    """
+    Returns the renderer configured through --headless (or --batch) and
+    --workers.
+    """
+    global _RENDERER
+    if _RENDERER is None:
+        _RENDERER = ChartRenderer(
+            headless=bool(config.get_parameter('headless') or config.get_parameter('batch')),
+            workers=config.get_worker_count(),
+            cache=ChartCache.from_config(),
+        )
+    return _RENDERER
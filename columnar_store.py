@@ -0,0 +1,429 @@
+"""
+Columnar on-disk format of an issues dataset: a directory with one NumPy
+.npy file per column and a manifest.json describing them. Convert a JSON
+data file once with
+
+    python columnar_store.py --data data/poetry_issues_all.json
+
+and point ENPM611_PROJECT_DATA_PATH at the resulting .columns directory.
+The columns are memory-mapped, so opening a dataset costs no parsing at
+all and only the columns an analysis touches are read from disk: the
+label analysis only pages in the label table, contributor and response
+analyses only the dates, states and event types they group by.
+
+The tables are the ones of IssueFrames (issues, events, labels,
+assignees) plus the free-text columns (title, text, url, event comments)
+needed to rebuild Issue objects for analyses that work on those.
+Column kinds:
+
+- int:      int64 values
+- date:     int64 microseconds since the epoch (UTC); NaT where missing
+- category: int32 codes into a vocabulary (.vocab.npy); -1 where missing
+- text:     UTF-8 bytes of all values (.data.npy) with start offsets
+            (.offsets.npy) and, if any value is missing, a null mask.
+            Values are decoded one row at a time from their slice of
+            the mapped bytes (see TextColumn)
+"""
+
+import argparse
+import json
+import os
+import shutil
+from functools import partial
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import issue_cache
+from issue_filter import IssueFilter
+from issue_frames import IssueFrames
+from model import Event, Issue, State
+from sharded_loader import iter_records
+
+# Bump whenever the layout of the columns changes
+FORMAT_VERSION:int = 1
+
+MANIFEST:str = 'manifest.json'
+
+# Value used for missing dates; viewed as datetime64 it is NaT
+_NAT:int = np.iinfo(np.int64).min
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Kind of every column, per table. The *_count columns give the number
+# of rows each issue has in the other tables, which are stored in issue
+# order.
+SCHEMA:Dict[str, Dict[str, str]] = {
+    'issues': {
+        'number': 'int', 'state': 'category', 'creator': 'category', 'created_date': 'date',
+        'updated_date': 'date', 'closed_date': 'date', 'title': 'text', 'text': 'text',
+        'url': 'text', 'timeline_url': 'text', 'event_count': 'int', 'label_count': 'int',
+        'assignee_count': 'int',
+    },
+    'events': {
+        'number': 'int', 'event_type': 'category', 'author': 'category', 'event_date': 'date',
+        'label': 'category', 'comment': 'text',
+    },
+    'labels': {'number': 'int', 'label': 'category'},
+    'assignees': {'number': 'int', 'login': 'category'},
+}
+
+# Columns of the IssueFrames tables; the others are only needed for Issue objects
+FRAME_COLUMNS:Dict[str, List[str]] = {
+    'issues': ['number', 'state', 'creator', 'created_date', 'updated_date', 'closed_date'],
+    'events': ['number', 'event_type', 'author', 'event_date', 'label'],
+    'labels': ['number', 'label'],
+    'assignees': ['number', 'login'],
+}
+
+_FRAME_CATEGORIES = {'state', 'event_type'}
+
+
+def is_columnar(path:str) -> bool:
+    """
+    Whether the path is a columnar dataset directory.
+    """
+    return os.path.isdir(path) and os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def get_default_path(data_path:str) -> str:
+    """
+    Returns where a JSON data file is converted to by default.
+    """
+    return os.path.splitext(data_path)[0] + '.columns'
+
+
+def _to_micros(value:Optional[datetime]) -> int:
+    if value is None:
+        return _NAT
+    if value.tzinfo is None:
+        # Naive timestamps are taken to be UTC, as in IssueFrames
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+class _ColumnWriter:
+
+    def __init__(self, directory:str, table:str, name:str, kind:str):
+        self.prefix:str = os.path.join(directory, f'{table}.{name}')
+        self.kind:str = kind
+        self.values:list = []
+
+    def write(self) -> dict:
+        if self.kind == 'int':
+            np.save(self.prefix + '.npy', np.asarray(self.values, dtype=np.int64))
+        elif self.kind == 'date':
+            np.save(self.prefix + '.npy', np.asarray([_to_micros(v) for v in self.values], dtype=np.int64))
+        elif self.kind == 'category':
+            vocab = sorted({v for v in self.values if v is not None})
+            codes = {v: i for i, v in enumerate(vocab)}
+            np.save(self.prefix + '.npy', np.asarray([codes.get(v, -1) if v is not None else -1
+                                                      for v in self.values], dtype=np.int32))
+            np.save(self.prefix + '.vocab.npy', np.asarray(vocab, dtype=str))
+        else:
+            encoded = [v.encode('utf-8') if v is not None else b'' for v in self.values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            np.save(self.prefix + '.data.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+            np.save(self.prefix + '.offsets.npy', offsets)
+            nulls = np.asarray([v is None for v in self.values], dtype=bool)
+            if nulls.any():
+                np.save(self.prefix + '.nulls.npy', nulls)
+        return {'kind': self.kind}
+
+
+def convert(data_path:str, out_path:str=None) -> str:
+    """
+    Converts a JSON data file into a columnar dataset directory and
+    returns its path. Issues are parsed one at a time; an existing
+    dataset at the path is replaced.
+    """
+    out_path = out_path or get_default_path(data_path)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    os.makedirs(tmp_path)
+    try:
+        writers = {table: {name: _ColumnWriter(tmp_path, table, name, kind) for name, kind in columns.items()}
+                   for table, columns in SCHEMA.items()}
+        issues, events, labels, assignees = (writers[t] for t in ('issues', 'events', 'labels', 'assignees'))
+        count = 0
+        for jobj in iter_records(data_path):
+            issue = Issue(jobj)
+            count += 1
+            number = issue.number
+            for name, value in (('number', number),
+                                ('state', issue.state.value if issue.state is not None else None),
+                                ('creator', issue.creator), ('created_date', issue.created_date),
+                                ('updated_date', issue.updated_date),
+                                ('closed_date', issue.event_index.closed), ('title', issue.title),
+                                ('text', issue.text), ('url', issue.url),
+                                ('timeline_url', issue.timeline_url), ('event_count', len(issue.events)),
+                                ('label_count', len(issue.labels)),
+                                ('assignee_count', len(issue.assignees))):
+                issues[name].values.append(value)
+            for event in issue.events:
+                for name, value in (('number', number), ('event_type', event.event_type),
+                                    ('author', event.author), ('event_date', event.event_date),
+                                    ('label', event.label), ('comment', event.comment)):
+                    events[name].values.append(value)
+            for label in issue.labels:
+                labels['number'].values.append(number)
+                labels['label'].values.append(label)
+            for assignee in issue.assignees:
+                assignees['number'].values.append(number)
+                assignees['login'].values.append(assignee.get('login'))
+
+        manifest = {
+            'version': FORMAT_VERSION,
+            'source': issue_cache.get_fingerprint(data_path),
+            'tables': {table: {'rows': len(columns['number'].values),
+                               'columns': {name: writer.write() for name, writer in columns.items()}}
+                       for table, columns in writers.items()},
+        }
+        with open(os.path.join(tmp_path, MANIFEST), 'w') as fout:
+            json.dump(manifest, fout, indent=2)
+        if os.path.isdir(out_path):
+            shutil.rmtree(out_path)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    print(f'💾 Converted {count} issues from {data_path} to {out_path}')
+    return out_path
+
+
+class ColumnarDataset:
+    """
+    A columnar dataset directory. Columns are memory-mapped when first
+    accessed and kept open.
+    """
+
+    def __init__(self, path:str):
+        self.path:str = path
+        with open(os.path.join(path, MANIFEST), 'r') as fin:
+            self.manifest:dict = json.load(fin)
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Columnar dataset {path} has format version {self.manifest.get('version')}, "
+                             f"expected {FORMAT_VERSION}; convert the data file again")
+        self._arrays:Dict[str, np.ndarray] = {}
+
+    def fingerprint(self) -> dict:
+        """
+        Identifies the dataset, e.g. for caches derived from it.
+        """
+        return {'columnar': FORMAT_VERSION, **self.manifest['source']}
+
+    def rows(self, table:str) -> int:
+        return self.manifest['tables'][table]['rows']
+
+    def _array(self, filename:str) -> np.ndarray:
+        array = self._arrays.get(filename)
+        if array is None:
+            path = os.path.join(self.path, filename)
+            try:
+                array = np.load(path, mmap_mode='r')
+            except ValueError:
+                # Empty arrays cannot be memory-mapped
+                array = np.load(path)
+            self._arrays[filename] = array
+        return array
+
+    def raw(self, table:str, name:str) -> np.ndarray:
+        """
+        The stored array of a column: values, dates or category codes.
+        """
+        return self._array(f'{table}.{name}.npy')
+
+    def column(self, table:str, name:str) -> np.ndarray:
+        """
+        A column decoded into a NumPy array: int64, datetime64[us] (UTC),
+        or objects (str or None) for categories and texts.
+        """
+        kind = self.manifest['tables'][table]['columns'][name]['kind']
+        if kind == 'int':
+            return self.raw(table, name)
+        if kind == 'date':
+            return self.raw(table, name).view('M8[us]')
+        if kind == 'category':
+            # Code -1 picks the None appended to the vocabulary
+            lookup = np.append(self._array(f'{table}.{name}.vocab.npy').astype(object), None)
+            return lookup[self.raw(table, name)]
+        return np.asarray(self.texts(table, name).tolist(), dtype=object)
+
+    def texts(self, table:str, name:str) -> 'TextColumn':
+        """
+        A text column whose rows are decoded when they are accessed.
+        """
+        nulls = None
+        if os.path.isfile(os.path.join(self.path, f'{table}.{name}.nulls.npy')):
+            nulls = self._array(f'{table}.{name}.nulls.npy')
+        return TextColumn(self._array(f'{table}.{name}.data.npy'),
+                          self._array(f'{table}.{name}.offsets.npy'), nulls)
+
+    def frame(self, table:str, positions:np.ndarray=None) -> pd.DataFrame:
+        """
+        One IssueFrames table, optionally only the given rows.
+        """
+        data = {}
+        for name in FRAME_COLUMNS[table]:
+            values = self.column(table, name)
+            if positions is not None:
+                values = values[positions]
+            if name.endswith('_date'):
+                data[name] = pd.Series(values).dt.tz_localize('UTC')
+            elif name == 'number':
+                data[name] = pd.Series(values, dtype='int64')
+            elif name in _FRAME_CATEGORIES:
+                data[name] = pd.Series(values, dtype=object).astype('category')
+            else:
+                data[name] = pd.Series(values, dtype=object)
+        return pd.DataFrame(data)
+
+    def select(self, issue_filter:IssueFilter) -> Optional[np.ndarray]:
+        """
+        Positions of the issues matching the filter, or None for all.
+        """
+        if issue_filter.is_empty():
+            return None
+        mask = np.ones(self.rows('issues'), dtype=bool)
+        if issue_filter.start_date is not None or issue_filter.end_bound is not None:
+            created = self.raw('issues', 'created_date')
+            mask &= created != _NAT
+            if issue_filter.start_date is not None:
+                mask &= created >= _to_micros(issue_filter.start_date)
+            if issue_filter.end_bound is not None:
+                mask &= created < _to_micros(issue_filter.end_bound)
+        if issue_filter.state is not None:
+            mask &= self._codes_of('issues', 'state', issue_filter.state.value)
+        if issue_filter.label is not None:
+            # Labels are stored in issue order, label_count rows per issue
+            matches = self._codes_of('labels', 'label', issue_filter.label)
+            owners = np.repeat(np.arange(self.rows('issues')), self.raw('issues', 'label_count'))
+            labeled = np.zeros(self.rows('issues'), dtype=bool)
+            labeled[owners[matches]] = True
+            mask &= labeled
+        return np.flatnonzero(mask)
+
+    def _codes_of(self, table:str, name:str, value:str) -> np.ndarray:
+        vocab = self._array(f'{table}.{name}.vocab.npy')
+        code = np.searchsorted(vocab, value)
+        if code >= len(vocab) or vocab[code] != value:
+            return np.zeros(self.rows(table), dtype=bool)
+        return self.raw(table, name) == code
+
+    def _child_positions(self, table:str, positions:np.ndarray) -> np.ndarray:
+        # Rows of the selected issues in a table stored in issue order
+        counts = self.raw('issues', f'{table[:-1]}_count')
+        starts = np.cumsum(counts) - counts
+        lengths = counts[positions]
+        shift = np.repeat(starts[positions] - (np.cumsum(lengths) - lengths), lengths)
+        return shift + np.arange(len(shift))
+
+    def frames(self, issue_filter:IssueFilter=None) -> IssueFrames:
+        """
+        The issues matching the filter as an IssueFrames whose tables are
+        only built (and paged in) when an analysis accesses them.
+        """
+        positions = self.select(issue_filter or IssueFilter())
+
+        def build(table):
+            if positions is None or table == 'issues':
+                return self.frame(table, positions)
+            return self.frame(table, self._child_positions(table, positions))
+
+        return IssueFrames(*(partial(build, table) for table in ('issues', 'events', 'labels', 'assignees')))
+
+    def iter_issues(self) -> Iterator[Issue]:
+        """
+        Rebuilds the Issue objects, in their original order.
+        """
+        # Texts are decoded row by row as the issues are built
+        cols = {name: self.texts('issues', name) if kind == 'text' else self.column('issues', name).tolist()
+                for name, kind in SCHEMA['issues'].items() if kind != 'date'}
+        dates = {name: _to_datetimes(self.raw('issues', name)) for name in ('created_date', 'updated_date')}
+        event_cols = {name: self.column('events', name).tolist() for name in ('event_type', 'author', 'label')}
+        event_cols['comment'] = self.texts('events', 'comment')
+        event_dates = _to_datetimes(self.raw('events', 'event_date'))
+        labels = self.column('labels', 'label').tolist()
+        logins = self.column('assignees', 'login').tolist()
+        states = {state.value: state for state in State}
+
+        e = l = a = 0
+        for i in range(self.rows('issues')):
+            issue = Issue()
+            issue.number = cols['number'][i]
+            issue.state = states.get(cols['state'][i])
+            issue.creator = cols['creator'][i]
+            issue.created_date = dates['created_date'][i]
+            issue.updated_date = dates['updated_date'][i]
+            issue.title = cols['title'][i]
+            issue.text = cols['text'][i]
+            issue.url = cols['url'][i]
+            issue.timeline_url = cols['timeline_url'][i]
+            n = cols['label_count'][i]
+            issue.labels = labels[l:l + n]
+            l += n
+            n = cols['assignee_count'][i]
+            issue.assignees = [{'login': login} for login in logins[a:a + n]]
+            a += n
+            events = []
+            for j in range(e, e + cols['event_count'][i]):
+                event = Event(None)
+                event.event_type = event_cols['event_type'][j]
+                event.author = event_cols['author'][j]
+                event.event_date = event_dates[j]
+                event.label = event_cols['label'][j]
+                event.comment = event_cols['comment'][j]
+                events.append(event)
+            e += len(events)
+            issue.events = events
+            yield issue
+
+    def to_issues(self) -> List[Issue]:
+        return list(self.iter_issues())
+
+
+class TextColumn:
+    """
+    Rows of a stored text column: UTF-8 bytes and the offsets where each
+    row starts, both memory-mapped. A row is decoded from its own slice
+    of the bytes, so only the pages of the rows read are loaded.
+    """
+
+    def __init__(self, data:np.ndarray, offsets:np.ndarray, nulls:Optional[np.ndarray]=None):
+        # Memoryviews are sliced and indexed without copies or NumPy scalars
+        self.data:memoryview = memoryview(data)
+        self.offsets:memoryview = memoryview(offsets)
+        self.nulls:Optional[memoryview] = memoryview(nulls) if nulls is not None else None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i:int) -> Optional[str]:
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def tolist(self) -> List[Optional[str]]:
+        return [self[i] for i in range(len(self))]
+
+
+def _to_datetimes(micros:np.ndarray) -> List[Optional[datetime]]:
+    # Aware UTC datetimes, as decoded from the JSON
+    values = micros.view('M8[us]').astype(object).tolist()
+    return [None if value is None else value.replace(tzinfo=timezone.utc) for value in values]
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser("columnar_store.py")
+    ap.add_argument('--data', type=str, required=False,
+                    help='JSON data file to convert (default: ENPM611_PROJECT_DATA_PATH)')
+    ap.add_argument('--out', type=str, required=False,
+                    help='Directory to write (default: the data file path with a .columns extension)')
+    args = ap.parse_args()
+    if args.data is None:
+        import config
+        args.data = config.get_parameter('ENPM611_PROJECT_DATA_PATH')
+    convert(args.data, args.out)
@@ -69,6 +69,15 @@ def get_parameter(parameter_name, default=None):
         return _config[parameter_name]
 
 
+def get_worker_count():
+    """
+    Number of worker processes for parallel work, configurable through
+    --workers. Defaults to the number of CPUs.
+    """
+    workers = get_parameter('workers')
+    return int(workers) if workers else (os.cpu_count() or 1)
+
+
 def convert_to_typed_value(value):
     """
     Parses parameter values and converts them to their
@@ -1,29 +1,132 @@
 import re
 from collections import Counter
-from textblob import TextBlob
 from wordcloud import WordCloud, STOPWORDS
 import matplotlib.pyplot as plt
+from aggregation import Accumulator, AggregationPipeline, accumulate
+from chart_renderer import ChartJob, get_renderer
 from data_loader import DataLoader
 from pdf_report_exporter import PDFReportExporter
+import profiler
+import sentiment
+from sentiment_cache import SentimentCache
 import os
 
+
+class SentimentAccumulator(Accumulator):
+    """
+    Polarity of each issue's text by issue number. The texts are scored
+    in parallel once all issues have been seen.
+    """
+
+    def __init__(self):
+        self.numbers = []
+        self.texts = []
+
+    def add(self, issue):
+        self.numbers.append(issue.number)
+        self.texts.append(issue.text or "")
+
+    def result(self):
+        cache = SentimentCache.from_config()
+        try:
+            polarities = sentiment.score_polarities(self.texts, cache=cache)
+        finally:
+            if cache is not None:
+                print(f"💾 Sentiment cache: {cache.hits} hits, {cache.misses} misses")
+                cache.close()
+        return dict(zip(self.numbers, polarities))
+
+
+# Words of three or more letters; matched on lowercased text
+WORD_PATTERN = re.compile(r"\b[a-zA-Z]{3,}\b")
+
+# Words left out of the word cloud
+WORDCLOUD_STOPWORDS = {w.lower() for w in STOPWORDS.union({
+    "python", "python3", "package", "pip", "install", "error",
+    "project", "file", "function", "version"
+})}
+
+
+class TextStatsAccumulator(Accumulator):
+    """
+    Tokenizes each issue text once, line by line, and counts both the
+    words (for keywords and the word cloud) and the lines that mention
+    an error or exception. The texts are never concatenated.
+    """
+
+    def __init__(self):
+        self.words = Counter()
+        self.error_lines = Counter()
+
+    def add(self, issue):
+        for line in (issue.text or "").splitlines():
+            lower = line.lower()
+            self.words.update(WORD_PATTERN.findall(lower))
+            if "error" in lower or "exception" in lower:
+                self.error_lines[line.strip()] += 1
+
+    def result(self):
+        return self
+
+
+def _draw_sentiment_categories(summary):
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.bar(summary.keys(), summary.values(), color=["green", "gray", "red"])
+    ax.set_title("Sentiment Classification")
+    ax.set_xlabel("Category")
+    ax.set_ylabel("Number of Issues")
+    return fig
+
+
+def _draw_wordcloud(frequencies):
+    wc = WordCloud(width=800, height=400, background_color="white")
+    wc.generate_from_frequencies(frequencies)
+    fig = plt.figure(figsize=(8, 4))
+    plt.imshow(wc, interpolation="bilinear")
+    plt.axis("off")
+    return fig
+
+
 class ContentTextAnalyzer:
     def __init__(self):
         self.report_data = {}
         self.chart_paths = []
+        # Polarity per issue number from the last sentiment analysis
+        self.sentiment_scores = {}
+
+    def accumulators(self):
+        """
+        Aggregates this analyzer needs from a single pass over the issues.
+        """
+        return {
+            "sentiment": SentimentAccumulator(),
+            "text_stats": TextStatsAccumulator(),
+        }
 
-    def run(self):
-        issues = DataLoader().get_issues()
-        self.compute_sentiment_summary(issues)
-        self.plot_sentiment_categories()
-        self.plot_wordcloud(issues)
-        self.get_top_keywords(issues)
-        self.get_common_error_messages(issues)
+    def run(self, results=None):
+        """
+        Runs the analysis. `results` are the outputs of accumulators()
+        when the issues were already aggregated by a shared pipeline.
+        """
+        with profiler.stage('content_text'):
+            if results is None:
+                issues = DataLoader().get_single_pass_issues()
+                results = AggregationPipeline(self.accumulators()).run(issues)
+            text_stats = results["text_stats"]
+            with profiler.stage('content_text.report'):
+                self.report_sentiment_summary(results["sentiment"])
+            with profiler.stage('content_text.plot'):
+                self.plot_sentiment_categories()
+                self.plot_wordcloud(text_stats.words)
+            with profiler.stage('content_text.report'):
+                self.report_top_keywords(text_stats.words)
+                self.report_common_error_messages(text_stats.error_lines)
 
     def get_top_keywords(self, issues, n=20):
-        all_text = " ".join(i.text or "" for i in issues)
-        words = re.findall(r"\b[a-zA-Z]{3,}\b", all_text.lower())
-        freq = Counter(words).most_common(n)
+        return self.report_top_keywords(accumulate(TextStatsAccumulator(), issues).words, n)
+
+    def report_top_keywords(self, words, n=20):
+        freq = words.most_common(n)
         self.report_data["Top Keywords"] = freq
         print("\n🔠 Top Keywords:")
         for w, c in freq:
@@ -31,11 +134,9 @@ class ContentTextAnalyzer:
         return freq
 
     def get_common_error_messages(self, issues):
-        errors = Counter()
-        for issue in issues:
-            for line in (issue.text or "").splitlines():
-                if "error" in line.lower() or "exception" in line.lower():
-                    errors[line.strip()] += 1
+        return self.report_common_error_messages(accumulate(TextStatsAccumulator(), issues).error_lines)
+
+    def report_common_error_messages(self, errors):
         common_errors = errors.most_common(10)
         self.report_data["Common Errors"] = common_errors
         print("\n❗ Common Error Messages:")
@@ -44,19 +145,11 @@ class ContentTextAnalyzer:
         return common_errors
 
     def compute_sentiment_summary(self, issues):
-        cats = {"Positive": 0, "Neutral": 0, "Negative": 0}
-        for issue in issues:
-            text = issue.text or ""
-            try:
-                s = TextBlob(text).sentiment.polarity
-            except Exception:
-                s = 0
-            if s > 0.1:
-                cats["Positive"] += 1
-            elif s < -0.1:
-                cats["Negative"] += 1
-            else:
-                cats["Neutral"] += 1
+        return self.report_sentiment_summary(accumulate(SentimentAccumulator(), issues))
+
+    def report_sentiment_summary(self, scores):
+        self.sentiment_scores = scores
+        cats = sentiment.summarize(scores.values())
         self.report_data["Sentiment Summary"] = cats
         print("\n🪄 Sentiment Summary:")
         for k, v in cats.items():
@@ -68,40 +161,22 @@ class ContentTextAnalyzer:
         if not summary:
             print("⚠️ No sentiment summary to plot.")
             return
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.bar(summary.keys(), summary.values(), color=["green", "gray", "red"])
-        ax.set_title("Sentiment Classification")
-        ax.set_xlabel("Category")
-        ax.set_ylabel("Number of Issues")
-        path = "sentiment_chart.png"
-        fig.savefig(path, bbox_inches="tight")
-        plt.show()
-        plt.close(fig)
+        path = get_renderer().submit(ChartJob(
+            _draw_sentiment_categories, "sentiment_chart.png", summary=dict(summary)))
         self.chart_paths.append(path)
         print(f"🖼️ Sentiment chart saved as {path}")
 
-    def plot_wordcloud(self, issues):
-        all_text = " ".join(i.text or "" for i in issues)
-        if not all_text.strip():
+    def plot_wordcloud(self, words):
+        frequencies = {w: c for w, c in words.items() if w not in WORDCLOUD_STOPWORDS}
+        if not frequencies:
             print("⚠️ No text found to generate word cloud.")
             return
-        stopwords = STOPWORDS.union({
-            "python", "python3", "package", "pip", "install", "error",
-            "project", "file", "function", "version"
-        })
-        wc = WordCloud(width=800, height=400, background_color="white", stopwords=stopwords)
-        wc.generate(all_text)
-        plt.figure(figsize=(8, 4))
-        plt.imshow(wc, interpolation="bilinear")
-        plt.axis("off")
-        path = "wordcloud.png"
-        plt.savefig(path, bbox_inches="tight")
-        plt.show()
-        plt.close()
+        path = get_renderer().submit(ChartJob(_draw_wordcloud, "wordcloud.png", frequencies=frequencies))
         self.chart_paths.append(path)
         print(f"🌥️ Word cloud saved as {path}")
 
     def export_report_pdf(self, filename="content_text_analysis_report.pdf"):
+        get_renderer().render_all()
         PDFReportExporter("Content/Text Analysis Report").export(
             self.report_data,
             chart_paths=self.chart_paths,
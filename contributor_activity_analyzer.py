@@ -1,55 +1,144 @@
-from collections import defaultdict
-from typing import List, Dict
+from typing import List, Dict, Union
 import matplotlib.pyplot as plt
+import config
+import profiler
+from chart_renderer import ChartJob, get_renderer
 from data_loader import DataLoader
-from model import Issue, State
+from issue_frames import IssueFrames, counts_to_dict
+from model import Issue
 from pdf_report_exporter import PDFReportExporter
 
 
+def _draw_top_contributors_by_active_issues(counts: Dict[str, int]):
+    contributors = list(counts.keys())
+    active_counts = list(counts.values())
+    sorted_data = sorted(zip(contributors, active_counts), key=lambda x: x[1], reverse=True)
+    sorted_contributors, sorted_counts = zip(*sorted_data)
+    fig = plt.figure(figsize=(10, 6))
+    plt.barh(sorted_contributors, sorted_counts, color="skyblue")
+    plt.xlabel("Number of Active Issues")
+    plt.title("Active Issues per Contributor")
+    plt.gca().invert_yaxis()
+    return fig
+
+
+def _draw_issue_type_distribution_per_contributor(distribution: Dict[str, Dict[str, int]]):
+    contributors = list(distribution.keys())
+    kinds = sorted({kind for dist in distribution.values() for kind in dist})
+    data = {kind: [] for kind in kinds}
+    for contributor in contributors:
+        for kind in kinds:
+            data[kind].append(distribution[contributor].get(kind, 0))
+    fig = plt.figure(figsize=(12, 6))
+    bottom = [0] * len(contributors)
+    colors = plt.cm.tab20.colors
+    for i, kind in enumerate(kinds):
+        plt.barh(contributors, data[kind], left=bottom, color=colors[i % len(colors)], label=kind)
+        bottom = [bottom[j] + data[kind][j] for j in range(len(bottom))]
+    plt.xlabel("Number of Issues")
+    plt.ylabel("Contributors")
+    plt.title("Issue Distribution by Kind per Contributor")
+    plt.legend(title="Issue Kind")
+    plt.gca().invert_yaxis()
+    return fig
+
+
 class ContributorActivityAnalyzer:
     def __init__(self):
         self.report_data = {}
         self.chart_paths = []
+        # In batch mode, summaries are printed for these contributors
+        # instead of prompting for names
+        self.BATCH = bool(config.get_parameter('batch'))
+        self.CONTRIBUTORS = self._parse_contributors(config.get_parameter('contributors'))
+        # Report from the aggregates updated by delta ingestion
+        self.DELTA = bool(config.get_parameter('delta'))
+
+    @staticmethod
+    def _parse_contributors(value) -> List[str]:
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = value.split(",")
+        return [str(name).strip() for name in value if str(name).strip()]
+
+    def accumulators(self):
+        """
+        Aggregates this analyzer needs from a single pass over the issues.
+        """
+        return {"frames": DataLoader().frames_accumulator()}
 
-    def run(self):
-        issues: List[Issue] = DataLoader().get_issues()
+    def run(self, results=None):
+        """
+        Runs the analysis. `results` are the outputs of accumulators()
+        when the issues were already aggregated by a shared pipeline.
+        """
+        with profiler.stage('contributors'):
+            if results is None and self.DELTA:
+                aggregates = DataLoader().get_snapshot_aggregates()
+                active_counts = aggregates.active_issues_per_contributor()
+                type_distribution = aggregates.issue_type_distribution()
+            else:
+                issues: IssueFrames = results["frames"] if results else DataLoader().get_frames()
 
-        # --- Collect data
-        active_counts = self.get_active_issues_count_per_contributor(issues)
-        type_distribution = self.get_issue_type_distribution_per_contributor(issues)
-        self.report_data["Active Issues per Contributor"] = active_counts
-        self.report_data["Issue Type Distribution"] = type_distribution
+                # --- Collect data (once; printing and plotting reuse it)
+                with profiler.stage('contributors.compute') as stage:
+                    stage.count(len(issues.issues))
+                    active_counts = self.get_active_issues_count_per_contributor(issues)
+                    type_distribution = self.get_issue_type_distribution_per_contributor(issues)
+            self.report_data["Active Issues per Contributor"] = active_counts
+            self.report_data["Issue Type Distribution"] = type_distribution
 
-        # --- Console output
-        self.printActiveIssuesPerContributor(issues)
-        self.printIssueTypeDistributionPerContributor(issues)
-        self.printContributorSummary(issues)
+            # --- Console output
+            with profiler.stage('contributors.report'):
+                self.printActiveIssuesPerContributor(active_counts)
+                self.printIssueTypeDistributionPerContributor(type_distribution)
+                self.printContributorSummary(active_counts, type_distribution)
 
-        # --- Plot charts (save + show)
-        self.plot_top_contributors_by_active_issues(issues)
-        self.plot_issue_type_distribution_per_contributor(issues)
+            # --- Plot charts (save + show)
+            with profiler.stage('contributors.plot'):
+                self.plot_top_contributors_by_active_issues(active_counts)
+                self.plot_issue_type_distribution_per_contributor(type_distribution)
 
     @staticmethod
-    def get_active_issues_count_per_contributor(issues: List[Issue]) -> Dict[str, int]:
-        active_issues_count = defaultdict(int)
-        for issue in issues:
-            if issue.state == State.open:
-                for contributor in issue.assignees:
-                    active_issues_count[contributor["login"]] += 1
-        return dict(active_issues_count)
+    def get_active_issues_count_per_contributor(issues: Union[List[Issue], IssueFrames]) -> Dict[str, int]:
+        frames = IssueFrames.of(issues)
+        open_numbers = frames.issues.loc[frames.issues["state"] == "open", "number"]
+        assignees = frames.assignees[frames.assignees["number"].isin(open_numbers)]
+        return counts_to_dict(assignees.groupby("login", sort=False).size())
 
     @staticmethod
-    def get_issue_type_distribution_per_contributor(issues: List[Issue]) -> Dict[str, Dict[str, int]]:
-        contributor_distribution = defaultdict(lambda: defaultdict(int))
-        for issue in issues:
-            kinds = [label.split('/')[1] for label in issue.labels if label.startswith("kind/")]
-            for contributor in issue.assignees:
-                for kind in kinds:
-                    contributor_distribution[contributor["login"]][kind] += 1
-        return {contrib: dict(dist) for contrib, dist in contributor_distribution.items()}
+    def get_issue_type_distribution_per_contributor(issues: Union[List[Issue], IssueFrames]) -> Dict[str, Dict[str, int]]:
+        frames = IssueFrames.of(issues)
+        kind_labels = frames.labels[frames.labels["label"].str.startswith("kind/", na=False)]
+        kinds = kind_labels.assign(kind=kind_labels["label"].str.split("/").str[1])[["number", "kind"]]
+        pairs = frames.assignees.merge(kinds, on="number")
+        contributor_distribution = {}
+        for (contributor, kind), count in pairs.groupby(["login", "kind"], sort=False).size().items():
+            contributor_distribution.setdefault(contributor, {})[kind] = int(count)
+        return contributor_distribution
     
     @staticmethod
-    def get_contributor_summary(contributor_name: str, issues: List[Issue]) -> Dict:
+    def build_contributor_index(active_counts: Dict[str, int],
+                                type_distribution: Dict[str, Dict[str, int]]) -> Dict[str, Dict]:
+        """
+        Precomputes the summary of every contributor, keyed by the
+        lowercased name, so any number of lookups cost O(1) each.
+        """
+        index = {}
+        for contributor in list(type_distribution.keys()) + list(active_counts.keys()):
+            key = contributor.lower()
+            if key in index:
+                continue
+            index[key] = {
+                "name": contributor,
+                "active_issues": active_counts.get(contributor, 0),
+                "issue_type_distribution": type_distribution.get(contributor, {})
+            }
+        return index
+
+    @staticmethod
+    def get_contributor_summary(contributor_name: str, issues: Union[List[Issue], IssueFrames]) -> Dict:
         active_counts = ContributorActivityAnalyzer.get_active_issues_count_per_contributor(issues)
         type_distribution = ContributorActivityAnalyzer.get_issue_type_distribution_per_contributor(issues)
         return {
@@ -57,85 +146,59 @@ class ContributorActivityAnalyzer:
             "issue_type_distribution": type_distribution.get(contributor_name, {})
         }
 
-    def plot_top_contributors_by_active_issues(self, issues: List[Issue]):
-        counts = self.get_active_issues_count_per_contributor(issues)
+    def plot_top_contributors_by_active_issues(self, counts: Dict[str, int]):
         if not counts:
             print("⚠️ No active issues to plot.")
             return
-        contributors = list(counts.keys())
-        active_counts = list(counts.values())
-        sorted_data = sorted(zip(contributors, active_counts), key=lambda x: x[1], reverse=True)
-        sorted_contributors, sorted_counts = zip(*sorted_data)
-        plt.figure(figsize=(10, 6))
-        plt.barh(sorted_contributors, sorted_counts, color="skyblue")
-        plt.xlabel("Number of Active Issues")
-        plt.title("Active Issues per Contributor")
-        plt.gca().invert_yaxis()
-        path = "chart_active_issues_per_contributor.png"
-        plt.savefig(path, bbox_inches="tight")
-        plt.tight_layout()
-        plt.show()
+        path = get_renderer().submit(ChartJob(
+            _draw_top_contributors_by_active_issues, "chart_active_issues_per_contributor.png",
+            counts=counts))
         self.chart_paths.append(path)
 
-    def plot_issue_type_distribution_per_contributor(self, issues: List[Issue]):
-        distribution = self.get_issue_type_distribution_per_contributor(issues)
+    def plot_issue_type_distribution_per_contributor(self, distribution: Dict[str, Dict[str, int]]):
         if not distribution:
             print("⚠️ No issue type distribution data to plot.")
             return
-        contributors = list(distribution.keys())
-        kinds = sorted({kind for dist in distribution.values() for kind in dist})
-        data = {kind: [] for kind in kinds}
-        for contributor in contributors:
-            for kind in kinds:
-                data[kind].append(distribution[contributor].get(kind, 0))
-        plt.figure(figsize=(12, 6))
-        bottom = [0] * len(contributors)
-        colors = plt.cm.tab20.colors
-        for i, kind in enumerate(kinds):
-            plt.barh(contributors, data[kind], left=bottom, color=colors[i % len(colors)], label=kind)
-            bottom = [bottom[j] + data[kind][j] for j in range(len(bottom))]
-        plt.xlabel("Number of Issues")
-        plt.ylabel("Contributors")
-        plt.title("Issue Distribution by Kind per Contributor")
-        plt.legend(title="Issue Kind")
-        plt.gca().invert_yaxis()
-        path = "chart_issue_type_distribution_per_contributor.png"
-        plt.savefig(path, bbox_inches="tight")
-        plt.tight_layout()
-        plt.show()
+        path = get_renderer().submit(ChartJob(
+            _draw_issue_type_distribution_per_contributor, "chart_issue_type_distribution_per_contributor.png",
+            distribution=distribution))
         self.chart_paths.append(path)
 
-    def printActiveIssuesPerContributor(self, issues):
+    def printActiveIssuesPerContributor(self, active_counts):
         print("\nActive Issues per Contributor:")
-        active_counts = self.get_active_issues_count_per_contributor(issues)
         for contributor, count in active_counts.items():
             print(f"{contributor}: {count}")
 
-    def printIssueTypeDistributionPerContributor(self, issues):
+    def printIssueTypeDistributionPerContributor(self, issue_distribution):
         print("\nIssue Type Distribution per Contributor:")
-        issue_distribution = self.get_issue_type_distribution_per_contributor(issues)
         for contributor, dist in issue_distribution.items():
             print(f"{contributor}: {dist}")
 
-    def printContributorSummary(self, issues):
+    def printContributorSummary(self, active_counts, type_distribution):
+        index = self.build_contributor_index(active_counts, type_distribution)
+        if self.BATCH:
+            for contributor_input in self.CONTRIBUTORS:
+                self._print_contributor_summary(index, contributor_input)
+            return
         while True:
             contributor_input = input("\nEnter a contributor name to view summary (or 'q' to continue): ").strip()
             if contributor_input.lower() == 'q':
                 break
-            all_contributors = self.get_issue_type_distribution_per_contributor(issues).keys()
-            contributors_lower_map = {c.lower(): c for c in all_contributors}
-            contributor_name = contributors_lower_map.get(contributor_input.lower())
-            if not contributor_name:
-                print(f"No data found for contributor '{contributor_input}'.")
-                continue
-            summary = self.get_contributor_summary(contributor_name, issues)
-            print(f"\nSummary for {contributor_name}:")
-            print(f"Active Issues: {summary['active_issues']}")
-            print("Issue Type Distribution:")
-            for kind, count in summary["issue_type_distribution"].items():
-                print(f"  {kind}: {count}")
+            self._print_contributor_summary(index, contributor_input)
+
+    def _print_contributor_summary(self, index, contributor_input):
+        summary = index.get(contributor_input.lower())
+        if not summary:
+            print(f"No data found for contributor '{contributor_input}'.")
+            return
+        print(f"\nSummary for {summary['name']}:")
+        print(f"Active Issues: {summary['active_issues']}")
+        print("Issue Type Distribution:")
+        for kind, count in summary["issue_type_distribution"].items():
+            print(f"  {kind}: {count}")
 
     def export_report_pdf(self, filename="contributor_activity_report.pdf"):
+        get_renderer().render_all()
         PDFReportExporter("Contributor Activity Analysis Report").export(
             self.report_data,
             chart_paths=self.chart_paths,
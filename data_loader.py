@@ -1,13 +1,44 @@
 
-import json
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Tuple
 
+import columnar_store
 import config
+import issue_cache
+import profiler
+import rollups
+import sharded_loader
+import snapshot_delta
+import timestamps
+from aggregation import accumulate
+from issue_filter import IssueFilter, IssueIndex
+from issue_frames import IssueFrames, IssueFramesAccumulator
+from columnar_store import ColumnarDataset
 from model import Issue
+from rollups import RollupAccumulator, Rollups
+from snapshot_delta import SnapshotAggregates, SnapshotDelta
 
 # Store issues as singleton to avoid reloads
 _ISSUES:List[Issue] = None
 
+# Index over _ISSUES used to answer filters, built on first request
+_INDEX:IssueIndex = None
+
+# Columnar views of filtered issues, keyed by IssueFilter.key()
+_FRAMES:Dict[tuple, IssueFrames] = {}
+_MAX_CACHED_FRAMES:int = 8
+
+# Time-bucketed rollups of _ISSUES, built or loaded on first request
+_ROLLUPS:Rollups = None
+
+# Fingerprint of the data file that _ISSUES and _ROLLUPS were cached for
+_FINGERPRINT:dict = None
+
+# Aggregates of the data file ingested as a delta (see load_delta())
+_AGGREGATES:SnapshotAggregates = None
+
+# Opened columnar dataset, if the data path is one
+_COLUMNAR:ColumnarDataset = None
+
 class DataLoader:
     """
     Loads the issue data into a runtime object.
@@ -18,6 +49,13 @@ class DataLoader:
         Constructor
         """
         self.data_path:str = config.get_parameter('ENPM611_PROJECT_DATA_PATH')
+        # Whether parsed issues are cached in a binary file next to the data file
+        self.use_cache:bool = config.get_parameter('ENPM611_PROJECT_CACHE', True)
+        # The data path is either a JSON file or a columnar dataset directory
+        self.columnar:bool = columnar_store.is_columnar(self.data_path)
+        # Whether single-pass consumers stream the issues from the data
+        # file instead of loading them all (see get_single_pass_issues())
+        self.stream:bool = bool(config.get_parameter('stream'))
         
     def get_issues(self):
         """
@@ -28,16 +66,215 @@ class DataLoader:
         if _ISSUES is None:
             _ISSUES = self._load()
             print(f'Loaded {len(_ISSUES)} issues from {self.data_path}.')
+            if timestamps.stats.fallback or timestamps.stats.failed:
+                print(f'Timestamps decoded: {timestamps.stats}')
         return _ISSUES
     
-    def _load(self):
+    def get_filtered_issues(self, issue_filter:IssueFilter=None) -> List[Issue]:
+        """
+        Returns the issues matching the filter. Without an explicit
+        filter, the --start_date/--end_date/--label/--state parameters
+        from the config are applied. Analyzers should use this instead
+        of get_issues().
+        """
+        global _INDEX
+        if issue_filter is None:
+            issue_filter = IssueFilter.from_config()
+        issues = self.get_issues()
+        if issue_filter.is_empty():
+            return issues
+        if _INDEX is None or _INDEX.issues is not issues:
+            _INDEX = IssueIndex(issues)
+        return _INDEX.select(issue_filter)
+    
+    def get_frames(self, issue_filter:IssueFilter=None) -> IssueFrames:
+        """
+        Returns the filtered issues (see get_filtered_issues()) as pandas
+        tables (see IssueFrames) for vectorized analysis.
+        """
+        if issue_filter is None:
+            issue_filter = IssueFilter.from_config()
+        key = issue_filter.key()
+        frames = _FRAMES.get(key)
+        if frames is None and self.columnar:
+            # Tables are read from the memory-mapped columns on first
+            # access, without building any Issue objects
+            frames = get_columnar_dataset(self.data_path).frames(issue_filter)
+        elif frames is None:
+            issues = self.get_single_pass_issues(issue_filter)
+            with profiler.stage('frames') as stage:
+                frames = accumulate(self.frames_accumulator(issue_filter), issues)
+                stage.count(len(frames))
+        if key not in _FRAMES:
+            if len(_FRAMES) >= _MAX_CACHED_FRAMES:
+                _FRAMES.clear()
+            _FRAMES[key] = frames
+        return frames
+    
+    def get_single_pass_issues(self, issue_filter:IssueFilter=None) -> Iterable[Issue]:
+        """
+        The filtered issues for consumers that iterate them only once,
+        such as an AggregationPipeline: streamed from the data file with
+        --stream (see iter_filtered_issues()), the loaded issues otherwise.
+        """
+        if self.stream:
+            return self.iter_filtered_issues(issue_filter)
+        return self.get_filtered_issues(issue_filter)
+    
+    def frames_accumulator(self, issue_filter:IssueFilter=None) -> IssueFramesAccumulator:
+        """
+        Accumulator that builds the IssueFrames of the filtered issues.
+        With --stream, it reads the issues again if the events table is
+        needed instead of keeping them all.
+        """
+        if not self.stream:
+            return IssueFramesAccumulator()
+        if issue_filter is None:
+            issue_filter = IssueFilter.from_config()
+        return IssueFramesAccumulator(reload=lambda: self.iter_filtered_issues(issue_filter))
+    
+    def get_rollups(self) -> Rollups:
+        """
+        Returns the per-day rollups of all issues (see rollups.Rollups),
+        from which trends over any date range are summed. With caching
+        enabled, they are persisted next to the data file and only
+        rebuilt when it changes.
+        """
+        global _ROLLUPS
+        if _ROLLUPS is None:
+            fingerprint = None
+            if self.columnar or self.use_cache:
+                fingerprint = self.get_fingerprint()
+                _ROLLUPS = rollups.load_rollups(self.data_path, fingerprint)
+            if _ROLLUPS is None:
+                issues = self.get_issues()
+                with profiler.stage('rollups'):
+                    _ROLLUPS = accumulate(RollupAccumulator(), issues)
+                if fingerprint is not None:
+                    rollups.save_rollups(self.data_path, fingerprint, _ROLLUPS)
+        return _ROLLUPS
+    
+    def iter_issues(self) -> Iterator[Issue]:
+        """
+        Streaming alternative to get_issues(). Yields the issues one at a
+        time so that single-pass consumers never hold the whole dataset.
+        If the issues are already loaded, they are yielded from memory.
         """
-        Loads the issues into memory.
+        if _ISSUES is not None:
+            yield from _ISSUES
+            return
+        if self.columnar:
+            yield from get_columnar_dataset(self.data_path).iter_issues()
+            return
+        for jobj in sharded_loader.iter_records(self.data_path):
+            yield Issue(jobj)
+    
+    def iter_filtered_issues(self, issue_filter:IssueFilter=None) -> Iterator[Issue]:
+        """
+        Streaming alternative to get_filtered_issues(). Yields the issues
+        matching the filter (by default the one from the config) in the
+        same order, without loading the whole dataset.
+        """
+        if issue_filter is None:
+            issue_filter = IssueFilter.from_config()
+        if _ISSUES is not None:
+            yield from self.get_filtered_issues(issue_filter)
+            return
+        for issue in self.iter_issues():
+            if issue_filter.matches(issue):
+                yield issue
+    
+    def load_delta(self, state_path:str=None) -> Tuple[SnapshotDelta, SnapshotAggregates]:
+        """
+        Delta mode: updates the aggregates persisted for the previous
+        snapshot (see snapshot_delta) with the issues that are new,
+        changed or deleted in the data file, saves them and returns
+        what changed along with the updated aggregates. The state file
+        defaults to ENPM611_PROJECT_STATE or <data file>.state.
+        """
+        if self.columnar:
+            raise ValueError('Delta ingestion reads the JSON data file, not a columnar dataset')
+        if state_path is None:
+            state_path = config.get_parameter('ENPM611_PROJECT_STATE',
+                                              snapshot_delta.get_state_path(self.data_path))
+        aggregates = snapshot_delta.load_state(state_path) or SnapshotAggregates()
+        delta = aggregates.apply(sharded_loader.iter_records(self.data_path))
+        snapshot_delta.save_state(state_path, aggregates)
+        print(f'🔄 Ingested {self.data_path}: {delta} issues.')
+        return delta, aggregates
+    
+    def get_fingerprint(self) -> dict:
+        """
+        Identifies the version of the data file (or columnar dataset)
+        that caches and persisted rollups were built from. Computed once,
+        like the issues it describes.
+        """
+        global _FINGERPRINT
+        if _FINGERPRINT is None:
+            if self.columnar:
+                _FINGERPRINT = get_columnar_dataset(self.data_path).fingerprint()
+            else:
+                _FINGERPRINT = issue_cache.get_fingerprint(self.data_path)
+        return _FINGERPRINT
+    
+    def get_snapshot_aggregates(self) -> SnapshotAggregates:
+        """
+        Returns the aggregates of all issues for --delta runs: the data
+        file is ingested as a delta (see load_delta()) on first request.
+        They describe the unfiltered snapshot, so filters are rejected.
         """
-        with open(self.data_path,'r') as fin:
-            return [Issue(i) for i in json.load(fin)]
+        global _AGGREGATES
+        if _AGGREGATES is None:
+            if not IssueFilter.from_config().is_empty():
+                raise ValueError('--delta reports on all issues and cannot be combined with '
+                                 '--start_date/--end_date/--label/--state')
+            with profiler.stage('delta') as stage:
+                delta, _AGGREGATES = self.load_delta()
+                stage.count(len(delta.new) + len(delta.changed) + len(delta.deleted))
+        return _AGGREGATES
     
+    def _load(self):
+        """
+        Loads the issues into memory. If caching is enabled, issues are
+        read from the binary cache when it matches the data file and the
+        cache is (re)written after parsing otherwise.
+        """
+        with profiler.stage('load') as stage:
+            if self.columnar:
+                # Nothing to parse, so there is nothing to cache either
+                issues = get_columnar_dataset(self.data_path).to_issues()
+            elif not self.use_cache:
+                issues = self._parse()
+            else:
+                fingerprint = self.get_fingerprint()
+                issues = issue_cache.load_issues(self.data_path, fingerprint)
+                if issues is None:
+                    issues = self._parse()
+                    issue_cache.save_issues(self.data_path, fingerprint, issues)
+            stage.count(len(issues))
+        return issues
+
+
+    def _parse(self) -> List[Issue]:
+        """
+        Parses all issues of the data file. JSONL files and shard
+        directories are parsed in parallel (see sharded_loader).
+        """
+        if sharded_loader.is_sharded(self.data_path):
+            return sharded_loader.load_issues(self.data_path, config.get_worker_count())
+        return list(self.iter_issues())
+
+
+def get_columnar_dataset(path:str) -> ColumnarDataset:
+    """
+    Returns the opened columnar dataset at the path.
+    """
+    global _COLUMNAR
+    if _COLUMNAR is None or _COLUMNAR.path != path:
+        _COLUMNAR = ColumnarDataset(path)
+    return _COLUMNAR
+
 
 if __name__ == '__main__':
     # Run the loader for testing
-    DataLoader().get_issues()
\ No newline at end of file
+    DataLoader().get_issues()
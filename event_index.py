@@ -0,0 +1,65 @@
+"""
+Per-issue index over the events of an issue, built lazily the first
+time Issue.event_index is read and kept for later reads. Events are
+sorted by date and bucketed by their (lowercased) type, and the
+timestamps the analyzers ask for most (first comment, first label,
+close) are precomputed, so metrics like the first response time are
+read in O(1) per issue instead of scanning all events.
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from model import Event
+
+# Event types only people with triage rights can cause on other people's
+# issues; their authors are treated as maintainers
+TRIAGE_EVENT_TYPES = ('labeled', 'unlabeled', 'assigned', 'unassigned', 'closed', 'reopened', 'milestoned')
+
+
+class EventIndex:
+
+    __slots__ = ('events', 'by_type', 'first_comment', 'first_label', 'closed')
+
+    def __init__(self, events:Iterable['Event']):
+        # Events without a date cannot be ordered and are left out
+        self.events:List['Event'] = sorted((e for e in events if e.event_date is not None),
+                                         key=lambda e: e.event_date)
+        self.by_type:Dict[str, List['Event']] = {}
+        for event in self.events:
+            self.by_type.setdefault((event.event_type or '').lower(), []).append(event)
+        self.first_comment:Optional[datetime] = self._first_date('commented')
+        self.first_label:Optional[datetime] = self._first_date('labeled')
+        # An issue that was reopened counts as closed when it was last closed
+        closed = self.by_type.get('closed')
+        self.closed:Optional[datetime] = closed[-1].event_date if closed else None
+
+    def _first_date(self, event_type:str) -> Optional[datetime]:
+        events = self.by_type.get(event_type)
+        return events[0].event_date if events else None
+
+    def of_type(self, event_type:str) -> List['Event']:
+        """
+        Events of the given type, oldest first.
+        """
+        return self.by_type.get(event_type, [])
+
+    def first_comment_by(self, authors:set, exclude:str=None) -> Optional[datetime]:
+        """
+        Date of the first comment by one of the authors, not counting
+        comments by `exclude` (usually the issue creator).
+        """
+        for event in self.by_type.get('commented', ()):
+            if event.author in authors and event.author != exclude:
+                return event.event_date
+        return None
+
+
+def hours_between(start:Optional[datetime], end:Optional[datetime]) -> Optional[float]:
+    """
+    Hours from start to end, or None if either is missing.
+    """
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds() / 3600
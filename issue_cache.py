@@ -0,0 +1,92 @@
+"""
+Binary on-disk cache of parsed issues. The cache is stored next to the
+data file and is only reused when the data file's fingerprint (path,
+size, modification time and content hash) matches the one it was
+created from, so timestamps never have to be parsed twice for the same
+snapshot.
+"""
+
+import hashlib
+import os
+import pickle
+from typing import List, Optional
+
+import sharded_loader
+from model import Issue
+
+# Bump whenever the layout of the cached objects changes
+CACHE_VERSION:int = 5
+
+_HASH_BLOCK_SIZE:int = 1 << 20
+
+
+def get_cache_path(data_path:str) -> str:
+    """
+    Returns the path of the cache file belonging to the given data file.
+    """
+    return data_path + '.cache'
+
+
+def get_fingerprint(data_path:str) -> dict:
+    """
+    Identifies the exact contents of a data file, or of all shards of a
+    shard directory (see sharded_loader).
+    """
+    shards = sharded_loader.list_shards(data_path)
+    sha = hashlib.sha256()
+    size = 0
+    mtime = 0
+    for shard in shards:
+        stat = os.stat(shard)
+        size += stat.st_size
+        mtime = max(mtime, stat.st_mtime_ns)
+        if os.path.isdir(data_path):
+            sha.update(os.path.basename(shard).encode('utf-8') + b'\0')
+        with open(shard, 'rb') as fin:
+            for block in iter(lambda: fin.read(_HASH_BLOCK_SIZE), b''):
+                sha.update(block)
+    return {
+        'version': CACHE_VERSION,
+        'path': os.path.abspath(data_path),
+        'size': size,
+        'mtime': mtime,
+        'sha256': sha.hexdigest(),
+    }
+
+
+def load_issues(data_path:str, fingerprint:dict) -> Optional[List[Issue]]:
+    """
+    Returns the cached issues for the data file, or None if there is
+    no cache or it was created from a different version of the file.
+    """
+    cache_path = get_cache_path(data_path)
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as fin:
+            # The fingerprint is stored first so that a stale cache is
+            # rejected without unpickling the issues
+            if pickle.load(fin) != fingerprint:
+                return None
+            return pickle.load(fin)
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable issue cache {cache_path}: {e}")
+        return None
+
+
+def save_issues(data_path:str, fingerprint:dict, issues:List[Issue]):
+    """
+    Writes the issues to the cache file of the data file. The file is
+    replaced atomically so concurrent runs never read a partial cache.
+    """
+    cache_path = get_cache_path(data_path)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fout:
+            pickle.dump(fingerprint, fout, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(issues, fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Warning: Could not write issue cache {cache_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,190 @@
+"""
+Shared filtering of issues by creation date range, label and state, as
+given through --start_date/--end_date/--label/--state. Filters are
+answered from an IssueIndex so that a narrow query costs time in
+proportion to the number of matching issues rather than the dataset.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from dateutil import parser
+
+import config
+from model import Issue, State
+
+
+def _to_utc(value:datetime) -> datetime:
+    """
+    Makes naive datetimes comparable with the (UTC) issue dates.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _parse_date(value:any) -> Optional[datetime]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return _to_utc(value)
+    # Parsed here rather than with timestamps.parse_timestamp so that
+    # command line dates do not show up in the loading statistics
+    text = str(value).strip()
+    try:
+        # fromisoformat only accepts the 'Z' suffix from Python 3.11 on
+        parsed = datetime.fromisoformat(text[:-1] + '+00:00' if text[-1:] == 'Z' else text)
+    except ValueError:
+        try:
+            parsed = parser.parse(text)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"Invalid date '{value}' (expected YYYY-MM-DD)") from None
+    return _to_utc(parsed)
+
+
+class IssueFilter:
+    """
+    Criteria that issues have to match. Unset criteria match everything.
+    The end date is inclusive: a plain date (YYYY-MM-DD) includes all
+    issues created on that day.
+    """
+
+    def __init__(self, start_date:any=None, end_date:any=None, label:str=None, state:any=None):
+        self.start_date:Optional[datetime] = _parse_date(start_date)
+        self.end_date:Optional[datetime] = _parse_date(end_date)
+        # Exclusive upper bound for created_date
+        self.end_bound:Optional[datetime] = None
+        if self.end_date is not None:
+            if isinstance(end_date, str) and len(end_date.strip()) == 10:
+                self.end_bound = self.end_date + timedelta(days=1)
+            else:
+                self.end_bound = self.end_date + timedelta(microseconds=1)
+        self.label:Optional[str] = label or None
+        self.state:Optional[State] = None
+        if state:
+            try:
+                self.state = State(str(state).strip().lower())
+            except ValueError:
+                raise ValueError(f"Invalid state '{state}' (expected open or closed)")
+
+    @classmethod
+    def from_config(cls) -> 'IssueFilter':
+        """
+        Creates the filter from the parameters passed on the command line.
+        """
+        return cls(
+            start_date=config.get_parameter('start_date'),
+            end_date=config.get_parameter('end_date'),
+            label=config.get_parameter('label'),
+            state=config.get_parameter('state'),
+        )
+
+    def is_empty(self) -> bool:
+        return self.start_date is None and self.end_date is None and self.label is None and self.state is None
+
+    def key(self) -> tuple:
+        """
+        Hashable identity of the filter, e.g. for caching results.
+        """
+        return (self.start_date, self.end_bound, self.label, self.state)
+
+    def matches(self, issue:Issue) -> bool:
+        """
+        Checks a single issue against the filter without using an index.
+        """
+        if self.start_date is not None or self.end_bound is not None:
+            if issue.created_date is None:
+                return False
+            created = _to_utc(issue.created_date)
+            if self.start_date is not None and created < self.start_date:
+                return False
+            if self.end_bound is not None and created >= self.end_bound:
+                return False
+        if self.label is not None and self.label not in issue.labels:
+            return False
+        if self.state is not None and issue.state != self.state:
+            return False
+        return True
+
+    def __str__(self):
+        parts = []
+        if self.start_date is not None:
+            parts.append(f'from {self.start_date.date()}')
+        if self.end_date is not None:
+            parts.append(f'until {self.end_date.date()}')
+        if self.label is not None:
+            parts.append(f'label={self.label}')
+        if self.state is not None:
+            parts.append(f'state={self.state.value}')
+        return ', '.join(parts) or 'no filter'
+
+
+class IssueIndex:
+    """
+    Precomputed lookup structures over a list of issues:
+
+    - issue positions sorted by created_date, for date-range bisection
+    - label -> positions posting lists
+    - state -> positions posting lists and byte masks
+    """
+
+    def __init__(self, issues:List[Issue]):
+        self.issues:List[Issue] = issues
+
+        dated = [(_to_utc(issue.created_date), pos) for pos, issue in enumerate(issues)
+                 if issue.created_date is not None]
+        dated.sort()
+        self._created_keys:List[datetime] = [created for created, _ in dated]
+        self._created_positions:List[int] = [pos for _, pos in dated]
+
+        self._label_postings:Dict[str, List[int]] = {}
+        self._state_postings:Dict[State, List[int]] = {state: [] for state in State}
+        for pos, issue in enumerate(issues):
+            for label in issue.labels:
+                postings = self._label_postings.setdefault(label, [])
+                # Guards against labels listed twice on the same issue
+                if not postings or postings[-1] != pos:
+                    postings.append(pos)
+            if issue.state is not None:
+                self._state_postings[issue.state].append(pos)
+
+        self._state_masks:Dict[State, bytearray] = {}
+        for state, postings in self._state_postings.items():
+            mask = bytearray(len(issues))
+            for pos in postings:
+                mask[pos] = 1
+            self._state_masks[state] = mask
+
+    def select(self, issue_filter:IssueFilter) -> List[Issue]:
+        """
+        Returns the issues matching the filter in their original order.
+        The smallest candidate set (date range, label postings or state
+        postings) drives the lookup; the other criteria are checked on
+        those candidates only.
+        """
+        if issue_filter.is_empty():
+            return self.issues
+
+        candidates:List[List[int]] = []
+        if issue_filter.start_date is not None or issue_filter.end_bound is not None:
+            lo = 0 if issue_filter.start_date is None else bisect_left(self._created_keys, issue_filter.start_date)
+            hi = len(self._created_keys) if issue_filter.end_bound is None \
+                else bisect_left(self._created_keys, issue_filter.end_bound)
+            candidates.append(self._created_positions[lo:max(lo, hi)])
+        if issue_filter.label is not None:
+            candidates.append(self._label_postings.get(issue_filter.label, []))
+        if issue_filter.state is not None:
+            candidates.append(self._state_postings[issue_filter.state])
+
+        driver = min(candidates, key=len)
+        state_mask = self._state_masks[issue_filter.state] if issue_filter.state is not None else None
+        positions = []
+        for pos in driver:
+            if state_mask is not None and not state_mask[pos]:
+                continue
+            if not issue_filter.matches(self.issues[pos]):
+                continue
+            positions.append(pos)
+        positions.sort()
+        return [self.issues[pos] for pos in positions]
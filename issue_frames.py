@@ -0,0 +1,151 @@
+"""
+Columnar (pandas) view of the issues. Analyzers use it to compute their
+aggregates with vectorized groupby operations instead of looping over
+Issue objects in Python.
+"""
+
+from typing import Callable, Iterable, List, Union
+
+import pandas as pd
+
+from aggregation import Accumulator, accumulate
+from model import Issue
+
+
+class IssueFrames:
+    """
+    Holds the issues as four tables that are linked by issue number:
+
+    issues:    number, state, creator, created_date, updated_date, closed_date
+    events:    number, event_type, author, event_date, label
+    labels:    number, label
+    assignees: number, login
+
+    A table can also be given as a function that builds it; it is then
+    built when it is first accessed, so analyses only pay for the tables
+    they use.
+    """
+
+    def __init__(self, issues:Union[pd.DataFrame, Callable], events:Union[pd.DataFrame, Callable],
+                 labels:Union[pd.DataFrame, Callable], assignees:Union[pd.DataFrame, Callable]):
+        self._tables:dict = {'issues': issues, 'events': events, 'labels': labels, 'assignees': assignees}
+
+    def _table(self, name:str) -> pd.DataFrame:
+        table = self._tables[name]
+        if callable(table):
+            table = self._tables[name] = table()
+        return table
+
+    @property
+    def issues(self) -> pd.DataFrame:
+        return self._table('issues')
+
+    @property
+    def events(self) -> pd.DataFrame:
+        return self._table('events')
+
+    @property
+    def labels(self) -> pd.DataFrame:
+        return self._table('labels')
+
+    @property
+    def assignees(self) -> pd.DataFrame:
+        return self._table('assignees')
+
+    def __len__(self):
+        return len(self.issues)
+
+    @classmethod
+    def from_issues(cls, issues:List[Issue]) -> 'IssueFrames':
+        """
+        Builds the tables from a list of issues.
+        """
+        return accumulate(IssueFramesAccumulator(), issues)
+
+    @classmethod
+    def of(cls, issues:Union[List[Issue], 'IssueFrames']) -> 'IssueFrames':
+        """
+        Lets analyzer methods accept either a list of issues or an
+        already built IssueFrames.
+        """
+        if isinstance(issues, IssueFrames):
+            return issues
+        return cls.from_issues(issues)
+
+
+class IssueFramesAccumulator(Accumulator):
+    """
+    Builds an IssueFrames while the issues are streamed through an
+    AggregationPipeline. The events table is only built from the issues'
+    events if it is accessed. For that, the issues are kept, or, if
+    `reload` is given, read again from the iterable it returns.
+    """
+
+    def __init__(self, reload:Callable[[], Iterable[Issue]]=None):
+        self.issue_cols = {'number': [], 'state': [], 'creator': [], 'created_date': [], 'updated_date': [],
+                           'closed_date': []}
+        self.reload:Callable[[], Iterable[Issue]] = reload
+        self.issues:List[Issue] = []
+        self.label_cols = {'number': [], 'label': []}
+        self.assignee_cols = {'number': [], 'login': []}
+
+    def add(self, issue:Issue):
+        number = issue.number
+        self.issue_cols['number'].append(number)
+        self.issue_cols['state'].append(issue.state.value if issue.state is not None else None)
+        self.issue_cols['creator'].append(issue.creator)
+        self.issue_cols['created_date'].append(issue.created_date)
+        self.issue_cols['updated_date'].append(issue.updated_date)
+        self.issue_cols['closed_date'].append(issue.closed_date)
+        if self.reload is None:
+            self.issues.append(issue)
+        for label in issue.labels:
+            self.label_cols['number'].append(number)
+            self.label_cols['label'].append(label)
+        for assignee in issue.assignees:
+            self.assignee_cols['number'].append(number)
+            self.assignee_cols['login'].append(assignee['login'])
+
+    def result(self) -> IssueFrames:
+        issues = self.issues
+        reload = self.reload or (lambda: issues)
+        return IssueFrames(_to_frame(self.issue_cols, {'state': 'category'}),
+                           lambda: _events_frame(reload()),
+                           _to_frame(self.label_cols), _to_frame(self.assignee_cols))
+
+
+def _events_frame(issues:Iterable[Issue]) -> pd.DataFrame:
+    cols = {'number': [], 'event_type': [], 'author': [], 'event_date': [], 'label': []}
+    for issue in issues:
+        for event in issue.events:
+            cols['number'].append(issue.number)
+            cols['event_type'].append(event.event_type)
+            cols['author'].append(event.author)
+            cols['event_date'].append(event.event_date)
+            cols['label'].append(event.label)
+    return _to_frame(cols, {'event_type': 'category'})
+
+
+def _to_frame(cols:dict, dtypes:dict=None) -> pd.DataFrame:
+    """
+    Builds a table from column lists. Dtypes are explicit so that empty
+    tables still support the .str and .dt accessors.
+    """
+    dtypes = dtypes or {}
+    data = {}
+    for name, values in cols.items():
+        if name == 'number':
+            data[name] = pd.Series(values, dtype='int64')
+        elif name.endswith('_date'):
+            data[name] = pd.to_datetime(pd.Series(values, dtype=object), utc=True)
+        else:
+            data[name] = pd.Series(values, dtype=object).astype(dtypes.get(name, object))
+    return pd.DataFrame(data)
+
+
+def counts_to_dict(counts:pd.Series) -> dict:
+    """
+    Converts a series of counts indexed by key into a plain dict of
+    Python ints.
+    """
+    return {key: int(count) for key, count in counts.items()}
@@ -0,0 +1,100 @@
+"""
+Incremental parsing of JSON data files whose top level is an array, so
+that huge dumps are read one issue at a time instead of all at once.
+"""
+
+import json
+from typing import Iterator, TextIO
+
+# Number of characters read from the data file at a time
+_CHUNK_SIZE:int = 1 << 16
+
+# Characters that can continue a JSON number
+_NUMBER_CHARS:frozenset = frozenset('0123456789+-.eE')
+
+
+def iter_json_array(fin:TextIO, chunk_size:int=_CHUNK_SIZE) -> Iterator[any]:
+    """
+    Incrementally parses a file containing a top-level JSON array and
+    yields its elements one at a time. Only the element currently being
+    decoded (plus one read chunk) is kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill(min_size:int=0) -> bool:
+        # Drops the consumed prefix and appends the next chunk(s)
+        nonlocal buf, pos, eof
+        data = fin.read(max(chunk_size, min_size))
+        if not data:
+            eof = True
+            return False
+        buf = buf[pos:] + data
+        pos = 0
+        return True
+
+    def skip(chars:str):
+        # Advances past the given characters, reading more data if needed
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    def fail(message:str):
+        # Raised like json.load() would for the same malformed input
+        raise json.JSONDecodeError(message, buf, pos)
+
+    skip(' \t\r\n')
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError('Expected a JSON array at the top level of the data file')
+    pos += 1
+    skip(' \t\r\n')
+
+    if pos < len(buf) and buf[pos] == ']':
+        pos += 1
+    else:
+        while True:
+            if pos >= len(buf):
+                fail('Unexpected end of data file inside the JSON array')
+            while True:
+                try:
+                    jobj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # Element is incomplete; grow the buffer geometrically so
+                    # large elements are not re-decoded once per chunk
+                    if eof or not fill(len(buf) - pos):
+                        raise
+                    continue
+                # A number cut off at the buffer boundary decodes early
+                # (e.g. '0.' of '0.1'), so it is only complete once a
+                # character that cannot continue it follows
+                rest = end
+                while rest < len(buf) and buf[rest] in _NUMBER_CHARS:
+                    rest += 1
+                if rest == len(buf) and not eof and fill():
+                    continue
+                break
+            pos = end
+            yield jobj
+            # Elements are separated by exactly one comma
+            skip(' \t\r\n')
+            if pos >= len(buf):
+                fail('Unexpected end of data file inside the JSON array')
+            if buf[pos] == ']':
+                pos += 1
+                break
+            if buf[pos] != ',':
+                fail("Expecting ',' delimiter")
+            pos += 1
+            skip(' \t\r\n')
+            if pos < len(buf) and buf[pos] == ']':
+                fail('Illegal trailing comma before end of array')
+
+    # Only whitespace may follow the array
+    skip(' \t\r\n')
+    if pos < len(buf):
+        fail('Extra data')
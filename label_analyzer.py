@@ -1,31 +1,101 @@
 from collections import Counter, defaultdict
 import matplotlib.pyplot as plt
+from chart_renderer import ChartJob, get_renderer
 from data_loader import DataLoader
+from issue_frames import IssueFrames, counts_to_dict
 from pdf_report_exporter import PDFReportExporter
+import config
+import profiler
 import os
 
+def _draw_kind_label_pie_chart(labels, sizes):
+    fig, ax = plt.subplots(figsize=(6, 6))
+    wedges, texts, autotexts = ax.pie(
+        sizes,
+        labels=labels,
+        autopct="%1.1f%%",
+        startangle=90,
+        pctdistance=0.85
+    )
+    centre_circle = plt.Circle((0, 0), 0.70, fc="white")
+    fig.gca().add_artist(centre_circle)
+    ax.axis("equal")
+    ax.set_title("Label Distribution: kind/* (Simplified)")
+    return fig
+
+
+def _draw_label_prefix_distribution(labels, values):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    bars = ax.bar(labels, values, color="teal", alpha=0.85)
+
+    # Add value labels on top of bars
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(
+            bar.get_x() + bar.get_width() / 2,
+            height + (max(values) * 0.01), 
+            f"{int(height)}",
+            ha="center",
+            va="bottom",
+            fontsize=9,
+            fontweight="bold"
+        )
+
+    ax.set_title("Label Category Distribution by Prefix", fontsize=12, weight="bold")
+    ax.set_xlabel("Label Prefix (category)")
+    ax.set_ylabel("Count of Labels")
+    ax.grid(axis="y", linestyle="--", alpha=0.6)
+
+    fig.tight_layout()
+    return fig
+
+
 class LabelAnalyzer:
     def __init__(self):
         self.report_data = {}
         self.chart_paths = []
+        # Report from the aggregates updated by delta ingestion
+        self.DELTA = bool(config.get_parameter('delta'))
 
-    def run(self):
-        issues = DataLoader().get_issues()
-
-        # --- Individual label analyses ---
-        kind_counts = self.analyze_kind_labels(issues)
-        area_counts = self.analyze_area_labels(issues)
-        prefix_counts = self.analyze_label_prefixes(issues)
-
-        # --- Charts ---
-        kind_chart = self.plot_kind_label_pie_chart(kind_counts)
-        prefix_chart = self.plot_label_prefix_distribution(prefix_counts)
-        if kind_chart:
-            self.chart_paths.append(kind_chart)
-        if prefix_chart:
-            self.chart_paths.append(prefix_chart)
+    def accumulators(self):
+        """
+        Aggregates this analyzer needs from a single pass over the issues.
+        """
+        return {"frames": DataLoader().frames_accumulator()}
 
-        # --- Print summaries (console) ---
+    def run(self, results=None):
+        """
+        Runs the analysis. `results` are the outputs of accumulators()
+        when the issues were already aggregated by a shared pipeline.
+        """
+        with profiler.stage('labels'):
+            if results is None and self.DELTA:
+                kind_counts, area_counts, prefix_counts = self.analyze_aggregates(
+                    DataLoader().get_snapshot_aggregates())
+            else:
+                issues = results["frames"] if results else DataLoader().get_frames()
+
+                # --- Individual label analyses ---
+                with profiler.stage('labels.compute') as stage:
+                    stage.count(len(issues.labels))
+                    kind_counts = self.analyze_kind_labels(issues)
+                    area_counts = self.analyze_area_labels(issues)
+                    prefix_counts = self.analyze_label_prefixes(issues)
+
+            # --- Charts ---
+            with profiler.stage('labels.plot'):
+                kind_chart = self.plot_kind_label_pie_chart(kind_counts)
+                prefix_chart = self.plot_label_prefix_distribution(prefix_counts)
+            if kind_chart:
+                self.chart_paths.append(kind_chart)
+            if prefix_chart:
+                self.chart_paths.append(prefix_chart)
+
+            # --- Print summaries (console) ---
+            with profiler.stage('labels.report'):
+                self.print_summary(kind_counts, area_counts, prefix_counts)
+
+    def print_summary(self, kind_counts, area_counts, prefix_counts):
         print("\n🏷️ Label Analysis Summary")
 
         print("\nKind Labels:")
@@ -40,31 +110,39 @@ class LabelAnalyzer:
         for prefix, count in prefix_counts.items():
             print(f"  {prefix}: {count}")
 
+    @staticmethod
+    def _count_labels_with_prefix(issues, prefix):
+        labels = IssueFrames.of(issues).labels["label"]
+        matching = labels[labels.str.startswith(prefix, na=False)]
+        return Counter(counts_to_dict(matching.groupby(matching, sort=False).size()))
+
+    def analyze_aggregates(self, aggregates):
+        """
+        Kind, area and prefix counts from the aggregates of delta
+        ingestion (see snapshot_delta).
+        """
+        kind_counts = Counter(aggregates.labels_with_prefix("kind/"))
+        area_counts = Counter(aggregates.labels_with_prefix("area/"))
+        prefix_counts = Counter(aggregates.label_prefixes())
+        self.report_data["Label: Kind Counts"] = dict(kind_counts)
+        self.report_data["Label: Area Counts"] = dict(area_counts)
+        self.report_data["Label: Prefix Breakdown"] = dict(prefix_counts)
+        return kind_counts, area_counts, prefix_counts
+
     def analyze_area_labels(self, issues):
-        area_counts = Counter()
-        for issue in issues:
-            for label in issue.labels:
-                if label.startswith("area/"):
-                    area_counts[label] += 1
+        area_counts = self._count_labels_with_prefix(issues, "area/")
         self.report_data["Label: Area Counts"] = dict(area_counts)
         return area_counts
 
     def analyze_kind_labels(self, issues):
-        kind_counts = Counter()
-        for issue in issues:
-            for label in issue.labels:
-                if label.startswith("kind/"):
-                    kind_counts[label] += 1
+        kind_counts = self._count_labels_with_prefix(issues, "kind/")
         self.report_data["Label: Kind Counts"] = dict(kind_counts)
         return kind_counts
 
     def analyze_label_prefixes(self, issues):
-        prefix_counts = Counter()
-        for issue in issues:
-            for label in issue.labels:
-                if "/" in label:
-                    prefix = label.split("/")[0]
-                    prefix_counts[prefix] += 1
+        labels = IssueFrames.of(issues).labels["label"]
+        prefixes = labels[labels.str.contains("/", regex=False, na=False)].str.split("/").str[0]
+        prefix_counts = Counter(counts_to_dict(prefixes.groupby(prefixes, sort=False).size()))
         self.report_data["Label: Prefix Breakdown"] = dict(prefix_counts)
         return prefix_counts
 
@@ -86,22 +164,8 @@ class LabelAnalyzer:
             labels_filtered.append("Other")
             sizes_filtered.append(other_total)
 
-        fig, ax = plt.subplots(figsize=(6, 6))
-        wedges, texts, autotexts = ax.pie(
-            sizes_filtered,
-            labels=labels_filtered,
-            autopct="%1.1f%%",
-            startangle=90,
-            pctdistance=0.85
-        )
-        centre_circle = plt.Circle((0, 0), 0.70, fc="white")
-        fig.gca().add_artist(centre_circle)
-        ax.axis("equal")
-        ax.set_title("Label Distribution: kind/* (Simplified)")
-
-        fig.savefig(save_path, bbox_inches="tight")
-        plt.show()
-        plt.close(fig)
+        save_path = get_renderer().submit(ChartJob(
+            _draw_kind_label_pie_chart, save_path, labels=labels_filtered, sizes=sizes_filtered))
         print(f"🖼️ Kind label chart saved as {save_path}")
         return save_path
 
@@ -116,35 +180,13 @@ class LabelAnalyzer:
         labels = list(prefix_counts.keys())
         values = list(prefix_counts.values())
 
-        fig, ax = plt.subplots(figsize=(8, 5))
-        bars = ax.bar(labels, values, color="teal", alpha=0.85)
-
-        # Add value labels on top of bars
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(
-                bar.get_x() + bar.get_width() / 2,
-                height + (max(values) * 0.01), 
-                f"{int(height)}",
-                ha="center",
-                va="bottom",
-                fontsize=9,
-                fontweight="bold"
-            )
-
-        ax.set_title("Label Category Distribution by Prefix", fontsize=12, weight="bold")
-        ax.set_xlabel("Label Prefix (category)")
-        ax.set_ylabel("Count of Labels")
-        ax.grid(axis="y", linestyle="--", alpha=0.6)
-
-        fig.tight_layout()
-        fig.savefig(save_path, bbox_inches="tight")
-        plt.show()
-        plt.close(fig)
+        save_path = get_renderer().submit(ChartJob(
+            _draw_label_prefix_distribution, save_path, labels=labels, values=values))
         print(f"🖼️ Label prefix distribution chart saved as {save_path}")
         return save_path
 
     def export_report_pdf(self, filename="label_analysis_report.pdf"):
+        get_renderer().render_all()
         print("\n📋 PDF Report Data Contents:")
         for key, value in self.report_data.items():
             print(f"  {key}: {value}")
@@ -1,12 +1,37 @@
 """
 Implements a runtime data model that can be used to access
 the properties contained in the issues JSON.
+
+Issues and events use __slots__ instead of a per-instance __dict__ and
+intern their low-cardinality string fields (authors, event types,
+labels), so a large dataset does not store the same strings over and
+over again.
+
+The events of an issue are kept as compact raw tuples, with their dates
+still unparsed, until issue.events (or issue.event_index, an EventIndex
+over them) is first accessed, so analyses that never look at events do
+not pay for parsing their dates or for the Event objects.
 """
 
+import sys
+import threading
 from typing import List, Dict, Set, Tuple
 from enum import Enum
 from datetime import datetime
-from dateutil import parser
+from event_index import EventIndex
+from timestamps import parse_timestamp
+
+# Guards materializing the lazily parsed events of issues shared between
+# threads (scheduler, server). One lock for all issues keeps Issue small;
+# it is only taken the first time an issue's events are read.
+_EVENTS_LOCK = threading.Lock()
+
+
+def _intern(value:any) -> any:
+    """
+    Interns strings so that equal values share a single object.
+    """
+    return sys.intern(value) if type(value) is str else value
 
 
 class State(str, Enum):
@@ -19,6 +44,8 @@ class State(str, Enum):
 
 class Event:
     
+    __slots__ = ('event_type', 'author', 'event_date', 'label', 'comment')
+    
     def __init__(self, jobj:any):
         self.event_type:str = None
         self.author:str = None
@@ -30,18 +57,35 @@ class Event:
             self.from_json(jobj)
     
     def from_json(self, jobj:any):
-        self.event_type = jobj.get('event_type')
-        self.author = jobj.get('author')
-        try:
-            self.event_date = parser.parse(jobj.get('event_date'))
-        except:
-            pass
-        self.label = jobj.get('label')
+        self.event_type = _intern(jobj.get('event_type'))
+        self.author = _intern(jobj.get('author'))
+        self.event_date = parse_timestamp(jobj.get('event_date'))
+        self.label = _intern(jobj.get('label'))
         self.comment = jobj.get('comment')
+
+    @staticmethod
+    def to_raw(jobj:any) -> tuple:
+        """
+        Compact form of an event's JSON that from_raw() turns into an
+        Event: its fields in slot order, with the date not yet parsed.
+        """
+        return (_intern(jobj.get('event_type')), _intern(jobj.get('author')), jobj.get('event_date'),
+                _intern(jobj.get('label')), jobj.get('comment'))
+
+    @classmethod
+    def from_raw(cls, raw:tuple) -> 'Event':
+        event = cls(None)
+        event.event_type, event.author, event_date, event.label, event.comment = raw
+        event.event_date = parse_timestamp(event_date)
+        return event
         
         
 class Issue:
     
+    __slots__ = ('url', 'creator', 'labels', 'state', 'assignees', 'title', 'text',
+                 'number', 'created_date', 'updated_date', 'timeline_url',
+                 '_raw_events', '_events', '_event_index')
+    
     def __init__(self, jobj:any=None):
         self.url:str = None
         self.creator:str = None
@@ -54,30 +98,74 @@ class Issue:
         self.created_date:datetime = None
         self.updated_date:datetime = None
         self.timeline_url:str = None
-        self.events:List[Event] = []
+        # Events in the form of Event.to_raw() until they are first accessed
+        self._raw_events:List[tuple] = None
+        self._events:List[Event] = []
+        self._event_index:EventIndex = None
         
         if jobj is not None:
             self.from_json(jobj)
     
     def from_json(self, jobj:any):
         self.url = jobj.get('url')
-        self.creator = jobj.get('creator')
-        self.labels = jobj.get('labels',[])
+        self.creator = _intern(jobj.get('creator'))
+        self.labels = [_intern(label) for label in jobj.get('labels',[])]
         self.state = State[jobj.get('state')]
         self.assignees = jobj.get('assignees',[])
+        for assignee in self.assignees:
+            if 'login' in assignee:
+                assignee['login'] = _intern(assignee['login'])
         self.title = jobj.get('title')
         self.text = jobj.get('text')
         try:
             self.number = int(jobj.get('number','-1'))
         except:
             pass
-        try:
-            self.created_date = parser.parse(jobj.get('created_date'))
-        except:
-            pass
-        try:
-            self.updated_date = parser.parse(jobj.get('updated_date'))
-        except:
-            pass
+        self.created_date = parse_timestamp(jobj.get('created_date'))
+        self.updated_date = parse_timestamp(jobj.get('updated_date'))
         self.timeline_url = jobj.get('timeline_url')
-        self.events = [Event(jevent) for jevent in jobj.get('events',[])]
\ No newline at end of file
+        self._raw_events = [Event.to_raw(jevent) for jevent in jobj.get('events',[])]
+        self._events = None
+        self._event_index = None
+
+    @property
+    def events(self) -> List[Event]:
+        events = self._events
+        if events is None:
+            with _EVENTS_LOCK:
+                # Another thread may have materialized them while we waited
+                events = self._events
+                if events is None:
+                    events = [Event.from_raw(raw_event) for raw_event in self._raw_events or ()]
+                    self._events = events
+                    self._raw_events = None
+        return events
+
+    @events.setter
+    def events(self, events:List[Event]):
+        with _EVENTS_LOCK:
+            self._events = events
+            self._raw_events = None
+            self._event_index = None
+
+    @property
+    def event_index(self) -> EventIndex:
+        index = self._event_index
+        if index is None:
+            index = self._event_index = EventIndex(self.events)
+        return index
+
+    @property
+    def closed_date(self) -> datetime:
+        """
+        When the issue was last closed (see EventIndex.closed). Read from
+        the raw events if they were not materialized yet, parsing only
+        the dates of close events.
+        """
+        raw = self._raw_events
+        if self._events is not None or raw is None:
+            return self.event_index.closed
+        dates = [parse_timestamp(event_date) for event_type, _, event_date, _, _ in raw
+                 if (event_type or '').lower() == 'closed']
+        dates = [date for date in dates if date is not None]
+        return max(dates) if dates else None
@@ -1,15 +1,45 @@
 from fpdf import FPDF
+from PIL import Image
+import config
 import os
 import platform
+import profiler
+
+# Page width available for content, in mm (A4 with 10 mm margins)
+_CONTENT_WIDTH = 190
+_CHART_WIDTH = 180
+_ROW_HEIGHT = 6
+_KEY_COLUMN_WIDTH = 70
+
+# Texts of up to this many characters per 10 mm always fit a column at
+# the table font size, so only longer ones are measured
+_SAFE_CHARS_PER_10MM = 2.5
+
+# Nested dicts with at most this many entries are written inline in a
+# table row (e.g. the issue types of one contributor); larger ones get
+# their own table
+_MAX_INLINE_ENTRIES = 20
+
+# Font file found for this platform, looked up once per process
+_FONT_PATH = None
+_FONT_PATH_LOOKED_UP = False
+
 
 class PDFReportExporter:
     def __init__(self, title):
         self.title = title
+        # Resolution charts are embedded at; larger images are downscaled
+        self.image_dpi = config.get_parameter('ENPM611_PROJECT_PDF_DPI', 150)
+        self.font_family = "Arial"
 
     def _get_system_font_path(self):
         """Get the appropriate font path based on operating system"""
+        global _FONT_PATH, _FONT_PATH_LOOKED_UP
+        if _FONT_PATH_LOOKED_UP:
+            return _FONT_PATH
+
         system = platform.system()
-        
+
         if system == "Windows":
             font_paths = [
                 "C:\\Windows\\Fonts\\arial.ttf",
@@ -25,50 +55,144 @@ class PDFReportExporter:
                 "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
                 "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
             ]
-        
-        # Return first existing font path
-        for path in font_paths:
-            if os.path.exists(path):
-                return path
-                
-        return None
+
+        # Remember the first existing font path
+        _FONT_PATH = next((path for path in font_paths if os.path.exists(path)), None)
+        _FONT_PATH_LOOKED_UP = True
+        return _FONT_PATH
 
     def export(self, report_data, chart_paths=None, filename="report.pdf"):
+        with profiler.stage('pdf') as stage:
+            stage.count(len(report_data) + len(chart_paths or []))
+            self._export(report_data, chart_paths, filename)
+
+    def _export(self, report_data, chart_paths, filename):
         pdf = FPDF()
+        pdf.set_auto_page_break(True, margin=15)
         pdf.add_page()
+        self._set_up_font(pdf)
 
-        # Get system-appropriate font path
-        font_path = self._get_system_font_path()
-        
-        if font_path and os.path.exists(font_path):
-            try:
-                # Add Unicode font and its bold version
-                pdf.add_font("Unicode", "", font_path, uni=True)
-                pdf.add_font("Unicode", "B", font_path, uni=True)
-                pdf.set_font("Unicode", size=12)
-            except Exception as e:
-                print(f"Warning: Could not load font {font_path}: {e}")
-                pdf.set_font("Arial", size=12)
-        else:
-            # Fallback to built-in Arial
-            pdf.set_font("Arial", size=12)
-
-        pdf.cell(0, 10, txt=self.title, ln=True, align="C")
+        pdf.set_font(self.font_family, size=14)
+        pdf.cell(0, 10, text=self.title, new_x="LMARGIN", new_y="NEXT", align="C")
         pdf.ln(10)
 
         for section, content in report_data.items():
-            pdf.set_font("Unicode", "B", 12)
-            pdf.cell(0, 10, txt=f"• {section}", ln=True)
-            pdf.set_font("Unicode", "", 10)
-            pdf.multi_cell(0, 8, str(content))
+            self._write_section(pdf, section, content, level=0)
             pdf.ln(5)
 
         if chart_paths:
             for path in chart_paths:
                 if os.path.exists(path):
                     pdf.add_page()
-                    pdf.image(path, x=10, y=None, w=180)
+                    pdf.image(self._prepare_image(path), x=10, y=None, w=_CHART_WIDTH)
                     pdf.ln(10)
 
         pdf.output(filename)
-        print(f"✅ PDF exported to {filename}")
\ No newline at end of file
+        print(f"✅ PDF exported to {filename}")
+
+    def _set_up_font(self, pdf):
+        # The same file used to be registered as the bold style as well,
+        # which parsed it twice without making anything bold; headings
+        # are set apart by size instead
+        font_path = self._get_system_font_path()
+        if font_path:
+            try:
+                pdf.add_font("Unicode", "", font_path)
+                self.font_family = "Unicode"
+            except Exception as e:
+                print(f"Warning: Could not load font {font_path}: {e}")
+        pdf.set_font(self.font_family, size=10)
+
+    def _text(self, value):
+        text = str(value)
+        if self.font_family != "Unicode":
+            # Built-in fonts only cover Latin-1
+            text = text.encode("latin-1", "replace").decode("latin-1")
+        return text
+
+    def _write_section(self, pdf, title, content, level):
+        pdf.set_font(self.font_family, size=12 if level == 0 else 11)
+        prefix = "• " if level == 0 and self.font_family == "Unicode" else ""
+        pdf.cell(0, 8, text=self._text(f"{prefix}{title}"), new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font(self.font_family, size=10)
+
+        if isinstance(content, dict):
+            self._write_dict(pdf, content, level)
+        elif isinstance(content, (list, tuple, set)):
+            self._write_rows(pdf, ((item, None) for item in content))
+        else:
+            pdf.multi_cell(0, _ROW_HEIGHT, self._text(content), new_x="LMARGIN", new_y="NEXT")
+
+    def _write_dict(self, pdf, content, level):
+        # Large nested values become sub-sections, so no row ever has to
+        # lay out a huge string
+        rows = []
+        for key, value in content.items():
+            if _is_large(value):
+                self._write_rows(pdf, rows)
+                rows = []
+                self._write_section(pdf, key, value, level + 1)
+            else:
+                rows.append((key, _inline(value)))
+        self._write_rows(pdf, rows)
+
+    def _write_rows(self, pdf, rows):
+        """
+        Writes a two-column table (one column for rows without a value)
+        one row at a time; page breaks happen between rows.
+        """
+        value_width = _CONTENT_WIDTH - _KEY_COLUMN_WIDTH
+        for key, value in rows:
+            if value is None:
+                pdf.multi_cell(0, _ROW_HEIGHT, self._text(key), new_x="LMARGIN", new_y="NEXT")
+                continue
+            key_text, value_text = self._text(key), self._text(value)
+            if _fits(pdf, key_text, _KEY_COLUMN_WIDTH) and _fits(pdf, value_text, value_width):
+                pdf.cell(_KEY_COLUMN_WIDTH, _ROW_HEIGHT, key_text)
+                pdf.cell(value_width, _ROW_HEIGHT, value_text, new_x="LMARGIN", new_y="NEXT")
+            else:
+                # Rare long rows wrap within their columns
+                with pdf.table(col_widths=(_KEY_COLUMN_WIDTH, value_width), first_row_as_headings=False,
+                               borders_layout="HORIZONTAL_LINES", line_height=_ROW_HEIGHT) as table:
+                    table.row((key_text, value_text))
+
+    def _prepare_image(self, path):
+        """
+        Downscales a chart to the target resolution at the width it is
+        embedded with and drops its alpha channel, which would otherwise
+        be embedded as a second image.
+        """
+        image = Image.open(path)
+        max_width = int(_CHART_WIDTH / 25.4 * self.image_dpi)
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        return image
+
+
+def _fits(pdf, text, width):
+    if len(text) <= width / 10 * _SAFE_CHARS_PER_10MM:
+        return True
+    return pdf.get_string_width(text) < width - 2
+
+
+def _is_large(value):
+    if isinstance(value, dict):
+        return (len(value) > _MAX_INLINE_ENTRIES
+                or any(isinstance(v, (dict, list, tuple, set)) for v in value.values()))
+    if isinstance(value, (list, tuple, set)):
+        return len(value) > _MAX_INLINE_ENTRIES
+    return False
+
+
+def _inline(value):
+    if isinstance(value, dict):
+        return ", ".join(f"{k}: {v}" for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(str(v) for v in value)
+    return value
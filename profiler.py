@@ -0,0 +1,279 @@
+"""
+Per-stage instrumentation, enabled with --profile.
+
+Code marks its stages with profiler.stage(name). While profiling, each
+stage records its wall time, CPU time, peak traced (tracemalloc) memory,
+the process's peak RSS and the number of items it processed. Stages
+that run more than once are summed up. The traced peak is process-wide,
+so it cannot be attributed to stages that overlap with stages of other
+threads (e.g. the analyzers the scheduler runs concurrently in batch
+mode); their peak is reported as unknown and only the peak of the whole
+run is given for them. At the end of the run a JSON
+summary is written (profile.json unless --profile_output is given), and
+--profile_dump additionally writes a cProfile dump of the whole run.
+
+When profiling is off, stage() returns a shared no-op context, so the
+instrumentation costs next to nothing.
+"""
+
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import config
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is not reported there
+    resource = None
+
+
+class StageStats:
+    """
+    Totals of all runs of one stage.
+    """
+
+    def __init__(self):
+        self.calls:int = 0
+        self.wall:float = 0.0
+        self.cpu:float = 0.0
+        self.peak_traced:int = 0
+        # Whether a run overlapped with stages of other threads, which
+        # makes peak_traced unknown
+        self.overlapped:bool = False
+        self.peak_rss:int = 0
+        self.items:int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'wall_seconds': round(self.wall, 6),
+            'cpu_seconds': round(self.cpu, 6),
+            'peak_traced_bytes': None if self.overlapped else self.peak_traced,
+            'overlapped': self.overlapped,
+            'peak_rss_bytes': self.peak_rss,
+            'items': self.items,
+        }
+
+
+class Stage:
+    """
+    A running stage. Items processed are reported with count().
+    """
+
+    def __init__(self):
+        self.items:int = 0
+        self.peak_traced:int = 0
+        self.overlapped:bool = False
+
+    def count(self, items:int):
+        self.items += items
+
+
+class _NoStage(Stage):
+
+    def count(self, items:int):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+@contextmanager
+def _no_stage():
+    yield _NO_STAGE
+
+
+class Profiler:
+
+    def __init__(self, enabled:bool=False, output:str='profile.json', dump:str=None):
+        self.enabled:bool = enabled
+        self.output:str = output
+        self.dump:Optional[str] = dump
+        self.stats:Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Open stages of each thread, by thread id
+        self._stacks:Dict[int, list] = {}
+        # Traced peak of the whole run
+        self._peak_traced:int = 0
+        self._cprofile:cProfile.Profile = None
+        self._timestamp_totals:dict = None
+
+    def start(self):
+        """
+        Starts memory tracing and, if requested, cProfile.
+        """
+        if not self.enabled:
+            return
+        tracemalloc.start()
+        self._instrument_timestamps()
+        if self.dump:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stage(self, name:str):
+        """
+        Context manager that measures the enclosed code as stage `name`.
+        """
+        if not self.enabled:
+            return _no_stage()
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name:str):
+        stack = self._stack()
+        stage = Stage()
+        # The traced peak is global, so it is reset per stage and folded
+        # into the enclosing stage when this one ends
+        with self._lock:
+            self._fold_peak(stack)
+            stack.append(stage)
+            self._reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield stage
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            with self._lock:
+                self._fold_peak(stack)
+                stack.pop()
+                if stack:
+                    stack[-1].peak_traced = max(stack[-1].peak_traced, stage.peak_traced)
+                self._reset_peak()
+            self.record(name, wall, cpu, stage.items, None if stage.overlapped else stage.peak_traced)
+
+    def _fold_peak(self, stack:list):
+        peak = tracemalloc.get_traced_memory()[1]
+        self._peak_traced = max(self._peak_traced, peak)
+        if stack:
+            stack[-1].peak_traced = max(stack[-1].peak_traced, peak)
+
+    def _reset_peak(self):
+        # Resetting would lose the peak of stages open in other threads,
+        # so while stages of several threads are open, the peak is kept
+        # and all of them are flagged instead
+        open_stacks = [stack for stack in self._stacks.values() if stack]
+        if len(open_stacks) <= 1:
+            tracemalloc.reset_peak()
+            return
+        for stack in open_stacks:
+            for stage in stack:
+                stage.overlapped = True
+
+    def record(self, name:str, wall:float, cpu:float, items:int=0, peak_traced:Optional[int]=0):
+        """
+        Adds a measurement of a stage that was timed elsewhere. A peak of
+        None means it is unknown because the stage overlapped with others.
+        """
+        with self._lock:
+            stats = self.stats.setdefault(name, StageStats())
+            stats.calls += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.items += items
+            if peak_traced is None:
+                stats.overlapped = True
+            else:
+                stats.peak_traced = max(stats.peak_traced, peak_traced)
+            stats.peak_rss = max(stats.peak_rss, _peak_rss())
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            with self._lock:
+                self._stacks[threading.get_ident()] = stack
+        return stack
+
+    def _instrument_timestamps(self):
+        # Dates are parsed while issues are built from the JSON, so their
+        # time is collected per call in the model module
+        import model
+        parse = model.parse_timestamp
+        totals = {'wall': 0.0, 'items': 0}
+
+        def timed_parse(value):
+            start = time.perf_counter()
+            try:
+                return parse(value)
+            finally:
+                totals['wall'] += time.perf_counter() - start
+                totals['items'] += 1
+
+        model.parse_timestamp = timed_parse
+        self._timestamp_totals = totals
+
+    def finish(self) -> Optional[dict]:
+        """
+        Stops profiling, writes the JSON summary (and the cProfile dump)
+        and returns the summary.
+        """
+        if not self.enabled:
+            return None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.dump)
+            print(f"🧪 cProfile dump written to {self.dump}")
+        totals = self._timestamp_totals
+        if totals and totals['items']:
+            self.record('load.dates', totals['wall'], totals['wall'], totals['items'])
+        self._fold_peak([])
+        tracemalloc.stop()
+
+        summary = {
+            'stages': {name: stats.to_dict() for name, stats in self.stats.items()},
+            'peak_traced_bytes': self._peak_traced,
+            'peak_rss_bytes': _peak_rss(),
+        }
+        with open(self.output, 'w') as fout:
+            json.dump(summary, fout, indent=2)
+
+        print("\n⏱️ Profile (wall s / CPU s / peak traced MB / items):")
+        for name, stats in self.stats.items():
+            peak = "n/a*" if stats.overlapped else f"{stats.peak_traced / 2**20:.1f}"
+            print(f"  {name}: {stats.wall:.3f} / {stats.cpu:.3f} / {peak} / {stats.items}")
+        if any(stats.overlapped for stats in self.stats.values()):
+            print("  * overlapped with stages of other threads")
+        print(f"  Peak traced memory of the run: {self._peak_traced / 2**20:.1f} MB")
+        print(f"🧪 Profile summary written to {self.output}")
+        return summary
+
+
+def _peak_rss() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+_PROFILER:Profiler = None
+
+
+def get_profiler() -> Profiler:
+    """
+    Returns the profiler configured through --profile, --profile_output
+    and --profile_dump.
+    """
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = Profiler(
+            enabled=bool(config.get_parameter('profile')),
+            output=config.get_parameter('profile_output', 'profile.json'),
+            dump=config.get_parameter('profile_dump'),
+        )
+    return _PROFILER
+
+
+def stage(name:str):
+    """
+    Shorthand for get_profiler().stage(name).
+    """
+    return get_profiler().stage(name)
@@ -0,0 +1,152 @@
+"""
+Mergeable streaming quantile sketch (KLL, Karnin, Lang and Liberty
+2016) for duration statistics over millions of issues.
+
+Values are added to a stack of compactors. When a level is full, it is
+sorted and every other value (at a random offset) is promoted to the
+next level with twice the weight, so memory stays at O(k) values while
+the rank error of any quantile is about 1.7 / k of the count. Two
+sketches, e.g. from parallel workers or from separate snapshots, are
+merged by concatenating their levels and compacting again. Count, mean,
+min and max are tracked exactly.
+"""
+
+import bisect
+import math
+import random
+from typing import Iterable, List
+
+# Shrink factor of the capacity of lower levels
+_C = 2 / 3
+
+
+class KLLSketch:
+
+    def __init__(self, k:int=200, seed:int=611):
+        self.k:int = k
+        self.compactors:List[List[float]] = [[]]
+        self.count:int = 0
+        self.total:float = 0.0
+        self.min:float = math.inf
+        self.max:float = -math.inf
+        # Seeded so the same data always gives the same report; created
+        # on the first compaction since most small sketches never need it
+        self._seed:int = seed
+        self._random:random.Random = None
+        self._retained:int = 0
+        self._max_retained:int = self._capacity(0)
+
+    def __len__(self) -> int:
+        """
+        Number of values currently retained (not the number added).
+        """
+        return self._retained
+
+    def _capacity(self, level:int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * _C ** depth)) + 1
+
+    def update(self, value:float):
+        """
+        Adds one value.
+        """
+        self.compactors[0].append(value)
+        self._retained += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self._retained >= self._max_retained:
+            self._compress()
+
+    def extend(self, values:Iterable[float]):
+        for value in values:
+            self.update(value)
+
+    def merge(self, other:'KLLSketch') -> 'KLLSketch':
+        """
+        Adds all values summarized by another sketch to this one.
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, values in enumerate(other.compactors):
+            self.compactors[level].extend(values)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._retained = sum(len(c) for c in self.compactors)
+        self._max_retained = sum(self._capacity(h) for h in range(len(self.compactors)))
+        while self._retained >= self._max_retained:
+            self._compress()
+        return self
+
+    def _compress(self):
+        for level, values in enumerate(self.compactors):
+            if len(values) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+            values.sort()
+            if self._random is None:
+                self._random = random.Random(self._seed)
+            # An odd value out stays on this level
+            kept = values[:1] if len(values) % 2 else []
+            pairs = values[len(kept):]
+            self.compactors[level + 1].extend(pairs[self._random.randint(0, 1)::2])
+            self.compactors[level] = kept
+            break
+        self._retained = sum(len(c) for c in self.compactors)
+        self._max_retained = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _weighted(self):
+        items = sorted((value, 1 << level)
+                       for level, values in enumerate(self.compactors) for value in values)
+        cumulative = []
+        weight = 0
+        for _, w in items:
+            weight += w
+            cumulative.append(weight)
+        return [value for value, _ in items], cumulative
+
+    def quantiles(self, qs:Iterable[float]) -> List[float]:
+        """
+        Approximate values at the given quantiles (0 to 1). The minimum
+        and maximum are exact.
+        """
+        values, cumulative = self._weighted()
+        if not values:
+            return [math.nan for _ in qs]
+        total = cumulative[-1]
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+            elif q >= 1:
+                result.append(self.max)
+            else:
+                result.append(values[min(bisect.bisect_left(cumulative, q * total), len(values) - 1)])
+        return result
+
+    def quantile(self, q:float) -> float:
+        return self.quantiles([q])[0]
+
+    def cdf(self, points:Iterable[float]) -> List[float]:
+        """
+        Approximate fraction of the values below each point.
+        """
+        values, cumulative = self._weighted()
+        if not values:
+            return [math.nan for _ in points]
+        total = cumulative[-1]
+        result = []
+        for point in points:
+            i = bisect.bisect_left(values, point)
+            result.append(cumulative[i - 1] / total if i else 0.0)
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
@@ -1,90 +1,357 @@
-from typing import List
 import numpy as np
 import matplotlib.pyplot as plt
+from aggregation import Accumulator, AggregationPipeline, accumulate
+from chart_renderer import ChartJob, get_renderer
 from data_loader import DataLoader
+from issue_frames import IssueFrames
+from event_index import TRIAGE_EVENT_TYPES, hours_between
 from model import Issue
 import config
+import profiler
 from pdf_report_exporter import PDFReportExporter
+from quantile_sketch import KLLSketch
+
+
+class FirstResponseTimeAccumulator(Accumulator):
+    """
+    Hours from the creation of each issue to its first comment, read from
+    the issue's event index.
+    """
+
+    def __init__(self):
+        self.times = {}
+
+    def add(self, issue: Issue):
+        hours = hours_between(issue.created_date, issue.event_index.first_comment)
+        if hours is not None:
+            self.times[issue.number] = hours
+
+    def result(self):
+        return self.times
+
+
+class FirstLabelTimeAccumulator(FirstResponseTimeAccumulator):
+    """
+    Hours from the creation of each issue until it was first labeled.
+    """
+
+    def add(self, issue: Issue):
+        hours = hours_between(issue.created_date, issue.event_index.first_label)
+        if hours is not None:
+            self.times[issue.number] = hours
+
+
+class MaintainerResponseTimeAccumulator(Accumulator):
+    """
+    Hours from the creation of each issue to the first comment by a
+    maintainer other than its creator. Maintainers are taken from the
+    'maintainers' parameter (comma-separated) or, by default, are the
+    people who triaged (labeled, assigned, closed, ...) someone else's
+    issue anywhere in the data.
+    """
+
+    def __init__(self, maintainers=None):
+        self.maintainers = set(maintainers) if maintainers else set()
+        self.derive_maintainers = not maintainers
+        # Only what the result needs is kept of each issue (not the issue
+        # itself), so streamed issues can be released: its number,
+        # creation date, creator and comments as (author, date), oldest
+        # first
+        self.issues = []
+
+    def add(self, issue: Issue):
+        if issue.created_date is None:
+            return
+        index = issue.event_index
+        comments = [(event.author, event.event_date) for event in index.of_type("commented")]
+        self.issues.append((issue.number, issue.created_date, issue.creator, comments))
+        if self.derive_maintainers:
+            for event_type in TRIAGE_EVENT_TYPES:
+                for event in index.of_type(event_type):
+                    if event.author and event.author != issue.creator:
+                        self.maintainers.add(event.author)
+
+    def result(self):
+        times = {}
+        for number, created_date, creator, comments in self.issues:
+            first = next((date for author, date in comments
+                          if author in self.maintainers and author != creator), None)
+            hours = hours_between(created_date, first)
+            if hours is not None:
+                times[number] = hours
+        return times
+
+
+class TimeSketches:
+    """
+    Quantile sketches of one duration over all issues, per label and per
+    month of creation. Like the sketches, they can be merged, e.g. across
+    workers or snapshots.
+    """
+
+    def __init__(self):
+        self.overall = KLLSketch()
+        self.by_label = {}
+        self.by_month = {}
+
+    def add(self, hours, labels, month):
+        self.overall.update(hours)
+        for label in labels:
+            self.by_label.setdefault(label, KLLSketch()).update(hours)
+        if month:
+            self.by_month.setdefault(month, KLLSketch()).update(hours)
+
+    def merge(self, other):
+        self.overall.merge(other.overall)
+        for groups, other_groups in ((self.by_label, other.by_label), (self.by_month, other.by_month)):
+            for key, sketch in other_groups.items():
+                groups.setdefault(key, KLLSketch()).merge(sketch)
+        return self
+
+
+class TimeSketchAccumulator(Accumulator):
+    """
+    Streams response and resolution times into TimeSketches, so their
+    statistics take bounded memory however many issues there are.
+    """
+
+    def __init__(self):
+        self.response = TimeSketches()
+        self.resolution = TimeSketches()
+
+    def add(self, issue: Issue):
+        if issue.created_date is None:
+            return
+        month = issue.created_date.strftime("%Y-%m")
+        index = issue.event_index
+        hours = hours_between(issue.created_date, index.first_comment)
+        if hours is not None:
+            self.response.add(hours, issue.labels, month)
+        if issue.state == "closed":
+            hours = hours_between(issue.created_date, index.closed or issue.updated_date)
+            if hours is not None:
+                self.resolution.add(hours, issue.labels, month)
+
+    def result(self):
+        return self
+
+
+def _draw_response_time_histogram(values, bins, weights=None):
+    fig = plt.figure(figsize=(8, 5))
+    plt.hist(values, bins=bins, weights=weights, edgecolor='black')
+    plt.title("Distribution of First Response Times (hours)")
+    plt.xlabel("Response Time (hours)")
+    plt.ylabel("Number of Issues")
+    plt.grid(axis='y', alpha=0.6)
+    plt.tight_layout()
+    return fig
+
+
+def _draw_response_vs_resolution_scatter(x, y):
+    fig = plt.figure(figsize=(7, 5))
+    plt.scatter(x, y, alpha=0.7)
+    plt.title("Response Time vs Resolution Time")
+    plt.xlabel("First Response Time (hours)")
+    plt.ylabel("Resolution Time (hours)")
+    plt.grid(True, linestyle='--', alpha=0.6)
+    plt.tight_layout()
+    return fig
 
 
 class ResponseResolutionAnalyzer:
     def __init__(self):
         self.USER = config.get_parameter('user')
         self.LABEL = config.get_parameter('label')
+        maintainers = config.get_parameter('maintainers')
+        if isinstance(maintainers, str):
+            maintainers = [name.strip() for name in maintainers.split(",") if name.strip()]
+        self.MAINTAINERS = maintainers or None
+        # Report percentiles from quantile sketches instead of exact arrays
+        self.STREAMING = bool(config.get_parameter('streaming_stats'))
+        # Report from the aggregates updated by delta ingestion
+        self.DELTA = bool(config.get_parameter('delta'))
         self.report_data = {}
         self.chart_paths = []
 
-    def run(self):
-        issues: List[Issue] = DataLoader().get_issues()
+    def accumulators(self):
+        """
+        Aggregates this analyzer needs from a single pass over the issues.
+        """
+        if self.STREAMING:
+            accumulators = self.time_accumulators()
+            del accumulators["first_response_times"]
+            return {"time_sketches": TimeSketchAccumulator(), **accumulators}
+        return {
+            "frames": DataLoader().frames_accumulator(),
+            **self.time_accumulators(),
+        }
+
+    def time_accumulators(self):
+        """
+        Per-issue durations, all read from the issues' event indexes.
+        """
+        return {
+            "first_response_times": FirstResponseTimeAccumulator(),
+            "first_label_times": FirstLabelTimeAccumulator(),
+            "maintainer_response_times": MaintainerResponseTimeAccumulator(self.MAINTAINERS),
+        }
 
-        response_times = self.get_first_response_times(issues)
-        resolution_times = self.get_resolution_times(issues)
+    def run(self, results=None):
+        """
+        Runs the analysis. `results` are the outputs of accumulators()
+        when the issues were already aggregated by a shared pipeline.
+        """
+        with profiler.stage('response_resolution'):
+            if results is None and self.DELTA:
+                self._run_delta(DataLoader().get_snapshot_aggregates())
+                return
+            if results is None:
+                loader = DataLoader()
+                accumulators = self.accumulators()
+                # The frames are shared with other analyzers through the
+                # loader, unless the issues are streamed and read only once
+                needs_frames = not loader.stream and accumulators.pop("frames", None) is not None
+                results = AggregationPipeline(accumulators).run(loader.get_single_pass_issues())
+                if needs_frames:
+                    results["frames"] = loader.get_frames()
 
-        self.print_summary_statistics(response_times, resolution_times)
-        self.plot_response_time_histogram(response_times)
-        self.plot_response_vs_resolution_scatter(response_times, resolution_times)
+            if self.STREAMING:
+                self._run_streaming(results)
+                return
+
+            response_times = results["first_response_times"]
+            with profiler.stage('response_resolution.compute') as stage:
+                stage.count(len(results["frames"].issues))
+                resolution_times = self.get_resolution_times(results["frames"])
+
+            with profiler.stage('response_resolution.report'):
+                self.print_summary_statistics(response_times, resolution_times)
+                self.print_triage_statistics(results["first_label_times"],
+                                             results["maintainer_response_times"])
+            with profiler.stage('response_resolution.plot'):
+                self.plot_response_time_histogram(response_times)
+                self.plot_response_vs_resolution_scatter(response_times, resolution_times)
+
+    def _run_delta(self, aggregates):
+        with profiler.stage('response_resolution.report'):
+            self.print_summary_statistics(aggregates.response_times, aggregates.resolution_times)
+            self.print_triage_statistics(aggregates.first_label_times,
+                                         aggregates.maintainer_response_times(self.MAINTAINERS))
+        with profiler.stage('response_resolution.plot'):
+            self.plot_response_time_histogram(aggregates.response_times)
+            self.plot_response_vs_resolution_scatter(aggregates.response_times, aggregates.resolution_times)
+
+    def _run_streaming(self, results):
+        sketches = results["time_sketches"]
+        with profiler.stage('response_resolution.report'):
+            self.print_sketch_statistics("Response Time Summary", sketches.response)
+            self.print_sketch_statistics("Resolution Time Summary", sketches.resolution)
+            self.print_triage_statistics(results["first_label_times"],
+                                         results["maintainer_response_times"])
+        with profiler.stage('response_resolution.plot'):
+            self.plot_response_time_histogram_from_sketch(sketches.response.overall)
+            print("The response vs. resolution scatter plot needs exact times and is skipped with streaming statistics.")
 
     def get_first_response_times(self, issues):
-        response_times = {}
-        for issue in issues:
-            if not hasattr(issue, "events") or not issue.events:
-                continue
-            created_time = getattr(issue, "created_date", None)
-            if not created_time:
-                continue
-            comment_times = [
-                e.event_date for e in issue.events
-                if hasattr(e, "event_type") and e.event_type.lower() == "commented"
-            ]
-            if comment_times:
-                first_response = min(comment_times)
-                delta = first_response - created_time
-                response_times[issue.number] = delta.total_seconds() / 3600
-        return response_times
+        return accumulate(FirstResponseTimeAccumulator(), issues)
 
     def get_resolution_times(self, issues):
-        resolution_times = {}
-        for issue in issues:
-            created_time = getattr(issue, "created_date", None)
-            updated_time = getattr(issue, "updated_date", None)
-            state = getattr(issue, "state", "").lower()
-            if created_time and updated_time and state == "closed":
-                delta = updated_time - created_time
-                resolution_times[issue.number] = delta.total_seconds() / 3600
-        return resolution_times
+        frames = IssueFrames.of(issues).issues
+        # Closed at the last close event; the update date stands in for
+        # issues whose close event is missing from the data
+        closed_date = frames["closed_date"].fillna(frames["updated_date"])
+        closed = frames[
+            (frames["state"] == "closed")
+            & frames["created_date"].notna()
+            & closed_date.notna()
+        ]
+        hours = (closed_date[closed.index] - closed["created_date"]).dt.total_seconds() / 3600
+        return dict(zip(closed["number"].tolist(), hours.tolist()))
+
+    @staticmethod
+    def summarize_times(data):
+        """
+        Count, mean, median, min and max (in hours) of a dict of durations.
+        Returns None if there is no data.
+        """
+        if not data:
+            return None
+        arr = np.array(list(data.values()))
+        return {
+            "Count": int(len(arr)),
+            "Mean (hrs)": float(np.mean(arr)),
+            "Median (hrs)": float(np.median(arr)),
+            "Min (hrs)": float(np.min(arr)),
+            "Max (hrs)": float(np.max(arr)),
+        }
+
+    def _print_time_summary(self, title, data):
+        print(f"\n--- {title} ---")
+        stats = self.summarize_times(data)
+        if stats is None:
+            print("No data available.")
+            self.report_data[title] = {"Info": "No data available."}
+            return
+
+        print(f"Count: {stats['Count']}")
+        print(f"Mean: {stats['Mean (hrs)']:.2f} hrs")
+        print(f"Median: {stats['Median (hrs)']:.2f} hrs")
+        print(f"Min: {stats['Min (hrs)']:.2f} hrs")
+        print(f"Max: {stats['Max (hrs)']:.2f} hrs")
+
+        self.report_data[title] = {k: v if k == "Count" else round(v, 2) for k, v in stats.items()}
+
+    @staticmethod
+    def summarize_sketch(sketch):
+        """
+        Count, mean, p50/p90/p99, min and max (in hours) of a quantile
+        sketch. Returns None if it is empty.
+        """
+        if not sketch.count:
+            return None
+        p50, p90, p99 = sketch.quantiles([0.5, 0.9, 0.99])
+        return {
+            "Count": sketch.count,
+            "Mean (hrs)": float(sketch.mean),
+            "p50 (hrs)": float(p50),
+            "p90 (hrs)": float(p90),
+            "p99 (hrs)": float(p99),
+            "Min (hrs)": float(sketch.min),
+            "Max (hrs)": float(sketch.max),
+        }
+
+    def print_sketch_statistics(self, title, sketches):
+        print(f"\n--- {title} ---")
+        stats = self.summarize_sketch(sketches.overall)
+        if stats is None:
+            print("No data available.")
+            self.report_data[title] = {"Info": "No data available."}
+            return
+        print(f"Count: {stats['Count']}")
+        print(f"Mean: {stats['Mean (hrs)']:.2f} hrs")
+        print(f"p50: {stats['p50 (hrs)']:.2f} hrs, p90: {stats['p90 (hrs)']:.2f} hrs, p99: {stats['p99 (hrs)']:.2f} hrs")
+        print(f"Min: {stats['Min (hrs)']:.2f} hrs")
+        print(f"Max: {stats['Max (hrs)']:.2f} hrs")
+        self.report_data[title] = {k: v if k == "Count" else round(v, 2) for k, v in stats.items()}
+
+        for group, sketch_by_key in (("Label", sketches.by_label), ("Month", sketches.by_month)):
+            print(f"\n{title} by {group} (p50 / p90 / p99 hrs):")
+            rows = {}
+            for key in sorted(sketch_by_key):
+                stats = self.summarize_sketch(sketch_by_key[key])
+                print(f"  {key}: {stats['p50 (hrs)']:.2f} / {stats['p90 (hrs)']:.2f} / "
+                      f"{stats['p99 (hrs)']:.2f} (n={stats['Count']})")
+                rows[key] = {k: round(stats[k], 2) for k in ("p50 (hrs)", "p90 (hrs)", "p99 (hrs)")}
+                rows[key]["Count"] = stats["Count"]
+            self.report_data[f"{title} by {group}"] = rows
 
     def print_summary_statistics(self, response_times, resolution_times):
-        def summary(title, data):
-            stats_dict = {}
-            print(f"\n--- {title} ---")
-            if not data:
-                print("No data available.")
-                stats_dict["Info"] = "No data available."
-                return stats_dict
-
-            arr = np.array(list(data.values()))
-            count = len(arr)
-            mean = np.mean(arr)
-            median = np.median(arr)
-            min_val = np.min(arr)
-            max_val = np.max(arr)
-
-            print(f"Count: {count}")
-            print(f"Mean: {mean:.2f} hrs")
-            print(f"Median: {median:.2f} hrs")
-            print(f"Min: {min_val:.2f} hrs")
-            print(f"Max: {max_val:.2f} hrs")
-
-            stats_dict["Count"] = int(count)
-            stats_dict["Mean (hrs)"] = round(float(mean), 2)
-            stats_dict["Median (hrs)"] = round(float(median), 2)
-            stats_dict["Min (hrs)"] = round(float(min_val), 2)
-            stats_dict["Max (hrs)"] = round(float(max_val), 2)
-
-            return stats_dict
-
-        self.report_data["Response Time Summary"] = summary("Response Time Summary", response_times)
-        self.report_data["Resolution Time Summary"] = summary("Resolution Time Summary", resolution_times)
+        self._print_time_summary("Response Time Summary", response_times)
+        self._print_time_summary("Resolution Time Summary", resolution_times)
+
+    def print_triage_statistics(self, first_label_times, maintainer_response_times):
+        self._print_time_summary("Time to First Label Summary", first_label_times)
+        self._print_time_summary("Maintainer Response Time Summary", maintainer_response_times)
 
 
     def plot_response_time_histogram(self, response_times, bins=None):
@@ -92,16 +359,22 @@ class ResponseResolutionAnalyzer:
             print("No response time data to plot.")
             return
         bins = bins or [1, 6, 24, 72, 168, 336, 720]
-        plt.figure(figsize=(8, 5))
-        plt.hist(list(response_times.values()), bins=bins, edgecolor='black')
-        plt.title("Distribution of First Response Times (hours)")
-        plt.xlabel("Response Time (hours)")
-        plt.ylabel("Number of Issues")
-        plt.grid(axis='y', alpha=0.6)
-        plt.tight_layout()
-        path = "chart_response_time_histogram.png"
-        plt.savefig(path, bbox_inches="tight")
-        plt.show()
+        path = get_renderer().submit(ChartJob(
+            _draw_response_time_histogram, "chart_response_time_histogram.png",
+            values=list(response_times.values()), bins=bins))
+        self.chart_paths.append(path)
+
+    def plot_response_time_histogram_from_sketch(self, sketch, bins=None):
+        if not sketch.count:
+            print("No response time data to plot.")
+            return
+        bins = bins or [1, 6, 24, 72, 168, 336, 720]
+        # Values per bin are estimated from the sketch's distribution
+        cdf = sketch.cdf(bins)
+        weights = [round(sketch.count * (cdf[i + 1] - cdf[i])) for i in range(len(bins) - 1)]
+        path = get_renderer().submit(ChartJob(
+            _draw_response_time_histogram, "chart_response_time_histogram.png",
+            values=bins[:-1], bins=bins, weights=weights))
         self.chart_paths.append(path)
 
     def plot_response_vs_resolution_scatter(self, response_times, resolution_times):
@@ -111,19 +384,12 @@ class ResponseResolutionAnalyzer:
             return
         x = [response_times[i] for i in common]
         y = [resolution_times[i] for i in common]
-        plt.figure(figsize=(7, 5))
-        plt.scatter(x, y, alpha=0.7)
-        plt.title("Response Time vs Resolution Time")
-        plt.xlabel("First Response Time (hours)")
-        plt.ylabel("Resolution Time (hours)")
-        plt.grid(True, linestyle='--', alpha=0.6)
-        plt.tight_layout()
-        path = "chart_response_vs_resolution.png"
-        plt.savefig(path, bbox_inches="tight")
-        plt.show()
+        path = get_renderer().submit(ChartJob(
+            _draw_response_vs_resolution_scatter, "chart_response_vs_resolution.png", x=x, y=y))
         self.chart_paths.append(path)
 
     def export_report_pdf(self, filename="response_resolution_report.pdf"):
+        get_renderer().render_all()
         PDFReportExporter("Response & Resolution Analysis Report").export(
             self.report_data,
             chart_paths=self.chart_paths,
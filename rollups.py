@@ -0,0 +1,224 @@
+"""
+Time-bucketed rollups of the issues for trend analysis.
+
+Aggregates are kept per UTC day and summed into weeks (ISO, e.g.
+2023-W05) or months (e.g. 2023-05) on request:
+
+- opened: issues created that day
+- closed: issues closed that day (last close event, or updated_date
+  for closed issues without one)
+- comments: comment events posted that day
+- response: sketch of the first response times of the issues created
+  that day
+- labels, sentiment: label and sentiment category counts of the issues
+  created that day
+
+Opened issues, response times, labels and sentiment belong to the day
+an issue was created, so summing the days of a --start_date/--end_date
+range gives the same numbers as filtering the issues, without scanning
+them again. Closed issues and comments are counted on the day they
+happened, i.e. activity within the range.
+
+The rollups of a data file are persisted next to it and rebuilt when
+the file changes.
+"""
+
+import os
+import pickle
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional
+
+import sentiment
+from aggregation import Accumulator
+from event_index import hours_between
+from model import Issue
+from quantile_sketch import KLLSketch
+from sentiment_cache import SentimentCache
+
+# Bump whenever the layout of the persisted rollups changes
+ROLLUPS_VERSION:int = 1
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def period_of(day:date, granularity:str) -> str:
+    """
+    Name of the week or month (or day) a day belongs to.
+    """
+    if granularity == 'month':
+        return f'{day.year:04d}-{day.month:02d}'
+    if granularity == 'week':
+        year, week, _ = day.isocalendar()
+        return f'{year:04d}-W{week:02d}'
+    if granularity == 'day':
+        return day.isoformat()
+    raise ValueError(f"Invalid granularity '{granularity}' (expected one of {', '.join(GRANULARITIES)})")
+
+
+class Bucket:
+    """
+    Aggregates of one day, or the sum of several days.
+    """
+
+    __slots__ = ('opened', 'closed', 'comments', 'response', 'labels', 'sentiment')
+
+    def __init__(self):
+        self.opened:int = 0
+        self.closed:int = 0
+        self.comments:int = 0
+        self.response:KLLSketch = KLLSketch()
+        self.labels:Counter = Counter()
+        self.sentiment:Counter = Counter()
+
+    def merge(self, other:'Bucket') -> 'Bucket':
+        self.opened += other.opened
+        self.closed += other.closed
+        self.comments += other.comments
+        self.response.merge(other.response)
+        self.labels.update(other.labels)
+        self.sentiment.update(other.sentiment)
+        return self
+
+
+class Rollups:
+    """
+    Buckets by UTC day, summed into periods or date ranges on request.
+    """
+
+    def __init__(self):
+        self.days:Dict[date, Bucket] = {}
+
+    def _bucket(self, when:datetime) -> Bucket:
+        day = when.date()
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = Bucket()
+        return bucket
+
+    def add(self, issue:Issue, polarity:Optional[float]=None):
+        """
+        Adds an issue, with the polarity of its text if it was scored.
+        """
+        index = issue.event_index
+        if issue.created_date is not None:
+            bucket = self._bucket(issue.created_date)
+            bucket.opened += 1
+            bucket.labels.update(issue.labels)
+            hours = hours_between(issue.created_date, index.first_comment)
+            if hours is not None:
+                bucket.response.update(hours)
+            if polarity is not None:
+                bucket.sentiment[sentiment.categorize(polarity)] += 1
+        if issue.state == 'closed':
+            closed = index.closed or issue.updated_date
+            if closed is not None:
+                self._bucket(closed).closed += 1
+        for event in index.of_type('commented'):
+            self._bucket(event.event_date).comments += 1
+
+    def _days_in(self, start:datetime=None, end_bound:datetime=None) -> Iterable[date]:
+        # Buckets hold whole days, so the range is rounded to days
+        first = start.date() if start is not None else None
+        last = end_bound.date() if end_bound is not None else None
+        for day in sorted(self.days):
+            if first is not None and day < first:
+                continue
+            if last is not None and (day > last or (day == last and end_bound.time() == datetime.min.time())):
+                break
+            yield day
+
+    def query(self, start:datetime=None, end_bound:datetime=None) -> Bucket:
+        """
+        Sum of the days from start up to (excluding) end_bound, as in
+        IssueFilter.start_date and IssueFilter.end_bound.
+        """
+        total = Bucket()
+        for day in self._days_in(start, end_bound):
+            total.merge(self.days[day])
+        return total
+
+    def rollup(self, granularity:str='month', start:datetime=None, end_bound:datetime=None) -> Dict[str, Bucket]:
+        """
+        Sums of the days in the range per week, month or day, oldest
+        period first. Periods without any activity are left out.
+        """
+        periods:Dict[str, Bucket] = {}
+        for day in self._days_in(start, end_bound):
+            key = period_of(day, granularity)
+            bucket = periods.get(key)
+            if bucket is None:
+                bucket = periods[key] = Bucket()
+            bucket.merge(self.days[day])
+        return periods
+
+
+class RollupAccumulator(Accumulator):
+    """
+    Builds the Rollups of the issues. Texts are scored for sentiment in
+    one batch (through the sentiment cache) once all issues were seen.
+    """
+
+    def __init__(self, with_sentiment:bool=True):
+        self.with_sentiment:bool = with_sentiment
+        self.issues = []
+
+    def add(self, issue:Issue):
+        self.issues.append(issue)
+
+    def result(self) -> Rollups:
+        polarities = [None] * len(self.issues)
+        if self.with_sentiment and self.issues:
+            cache = SentimentCache.from_config()
+            try:
+                polarities = sentiment.score_polarities([issue.text or "" for issue in self.issues], cache=cache)
+            finally:
+                if cache is not None:
+                    cache.close()
+        rollups = Rollups()
+        for issue, polarity in zip(self.issues, polarities):
+            rollups.add(issue, polarity)
+        return rollups
+
+
+def get_rollups_path(data_path:str) -> str:
+    """
+    Returns the path of the persisted rollups of a data file.
+    """
+    return data_path + '.rollups'
+
+
+def load_rollups(data_path:str, fingerprint:dict) -> Optional[Rollups]:
+    """
+    Returns the persisted rollups of the data file, or None if there
+    are none or they were built from a different version of the file.
+    """
+    path = get_rollups_path(data_path)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as fin:
+            if pickle.load(fin) != (ROLLUPS_VERSION, fingerprint):
+                return None
+            return pickle.load(fin)
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable rollups {path}: {e}")
+        return None
+
+
+def save_rollups(data_path:str, fingerprint:dict, rollups:Rollups):
+    """
+    Persists the rollups of the data file. The file is replaced
+    atomically so concurrent runs never read partial rollups.
+    """
+    path = get_rollups_path(data_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fout:
+            pickle.dump((ROLLUPS_VERSION, fingerprint), fout, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(rollups, fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write rollups {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -2,14 +2,22 @@
 Starting point of the application.
 """
 import argparse
+import sys
 from datetime import datetime
 
 import config
+import profiler
+import scheduler
+from aggregation import AggregationPipeline
+from chart_renderer import get_renderer
+from data_loader import DataLoader
+from issue_filter import IssueFilter
 from example_analysis import ExampleAnalysis
 from content_text_analyzer import ContentTextAnalyzer
 from label_analyzer import LabelAnalyzer
 from contributor_activity_analyzer import ContributorActivityAnalyzer
 from response_resolution_analyzer import ResponseResolutionAnalyzer
+from trend_analyzer import TrendAnalyzer
 
 
 def parse_args():
@@ -17,7 +25,7 @@ def parse_args():
     ap = argparse.ArgumentParser("run.py")
 
     ap.add_argument('--feature', '-f', type=int, required=True,
-                    help='Which feature to run (1–5)')
+                    help='Which feature to run (1–6)')
     ap.add_argument('--start_date', type=str, required=False,
                     help='Start date (YYYY-MM-DD)')
     ap.add_argument('--end_date', type=str, required=False,
@@ -26,6 +34,28 @@ def parse_args():
                     help='Optional label filter')
     ap.add_argument('--state', type=str, required=False,
                     help='Filter by issue state (open or closed)')
+    ap.add_argument('--granularity', type=str, required=False, choices=['day', 'week', 'month'],
+                    help='Period of the trend analysis (default: month)')
+    ap.add_argument('--workers', type=int, required=False,
+                    help='Worker processes for sentiment scoring and chart rendering (default: CPU count)')
+    ap.add_argument('--delta', action='store_true',
+                    help='Ingest the data file as a delta and report from the updated aggregates (features 1, 2 and 4)')
+    ap.add_argument('--stream', action='store_true',
+                    help='Stream the issues from the data file instead of loading them all (features 1-5)')
+    ap.add_argument('--headless', action='store_true',
+                    help='Render charts to PNG files in parallel without opening windows')
+    ap.add_argument('--batch', action='store_true',
+                    help='Never read from stdin (implies --headless)')
+    ap.add_argument('--contributors', type=str, required=False,
+                    help='Comma-separated contributor names to summarize in batch mode')
+    ap.add_argument('--streaming_stats', action='store_true',
+                    help='Report response/resolution percentiles per label and month from quantile sketches')
+    ap.add_argument('--profile', action='store_true',
+                    help='Record time, memory and item counts per stage')
+    ap.add_argument('--profile_output', type=str, required=False,
+                    help='Where to write the JSON profile summary (default: profile.json)')
+    ap.add_argument('--profile_dump', type=str, required=False,
+                    help='Also write a cProfile dump of the whole run to this file')
     return ap.parse_args()
 
 
@@ -37,23 +67,25 @@ def interactive_mode():
     print("3️⃣  Content/Text Analysis")
     print("4️⃣  Label Analysis")
     print("5️⃣  Combined Report (All Analyses)")
+    print("6️⃣  Trend Analysis")
 
     while True:
         try:
-            feature = int(input("Enter choice (1–5): ").strip())
-            if feature in [1, 2, 3, 4, 5]:
+            feature = int(input("Enter choice (1–6): ").strip())
+            if feature in [1, 2, 3, 4, 5, 6]:
                 break
         except ValueError:
             pass
-        print("Invalid input. Please enter 1–5.")
+        print("Invalid input. Please enter 1–6.")
 
     start_date = input("Start date (YYYY-MM-DD) or leave blank: ").strip()
     end_date = input("End date (YYYY-MM-DD) or leave blank: ").strip()
     label = input("Filter by label (e.g. kind/bug) or leave blank: ").strip()
     state = input("Filter by state (open/closed) or leave blank: ").strip()
 
-    start_date = datetime.fromisoformat(start_date) if start_date else None
-    end_date = datetime.fromisoformat(end_date) if end_date else None
+    # Validate the dates but keep them as strings so they can be stored in the config
+    start_date = datetime.fromisoformat(start_date).date().isoformat() if start_date else None
+    end_date = datetime.fromisoformat(end_date).date().isoformat() if end_date else None
 
     return {
         "feature": feature,
@@ -64,58 +96,63 @@ def interactive_mode():
     }
 
 
-if __name__ == "__main__":
-    # Interactive or non-interactive mode
-    mode = input("Run in interactive mode? (y/n): ").strip().lower()
-
-    if mode == "y":
-        args_dict = interactive_mode()
-        args = argparse.Namespace(**args_dict)
-    else:
-        args = parse_args()
-        config.overwrite_from_args(args)
-
-    feature = args.feature
-
-    # --- Run the selected analyzer(s) ---
+def run_feature(feature):
+    """Runs the selected analyzer(s)."""
     if feature == 1:
         print("\n👥 Running Contributor Activity Analysis...")
         analyzer = ContributorActivityAnalyzer()
         analyzer.run()
+        get_renderer().render_all()
         print("\n✅ Contributor Activity Analysis Complete.")
 
     elif feature == 2:
         print("\n🕒 Running Response & Resolution Analysis...")
         analyzer = ResponseResolutionAnalyzer()
         analyzer.run()
+        get_renderer().render_all()
         print("\n✅ Response & Resolution Analysis Complete.")
 
     elif feature == 3:
         print("\n🧠 Running Content/Text Analysis...")
         analyzer = ContentTextAnalyzer()
         analyzer.run()
+        get_renderer().render_all()
         print("\n✅ Content/Text Analysis Complete.")
 
     elif feature == 4:
         print("\n🏷️ Running Label Analysis...")
         analyzer = LabelAnalyzer()
         analyzer.run()
+        get_renderer().render_all()
         print("\n✅ Label Analysis Complete.")
 
     elif feature == 5:
         print("\n📊 Running Combined Report (All Analyses)...")
 
-        # Sequentially run all analyzers
         ca = ContributorActivityAnalyzer()
         rra = ResponseResolutionAnalyzer()
         cta = ContentTextAnalyzer()
         la = LabelAnalyzer()
 
-        # Each analyzer loads data via DataLoader
-        ca.run()
-        rra.run()
-        cta.run()
-        la.run()
+        # Aggregate for all analyzers in a single pass over the issues
+        issues = DataLoader().get_single_pass_issues()
+        if config.get_parameter('batch'):
+            # Nothing is read from stdin or shown, so the analyzers can run
+            # concurrently
+            scheduler.run_analyzers([ca, rra, cta, la], issues)
+        else:
+            pipeline = AggregationPipeline()
+            for a in [ca, rra, cta, la]:
+                pipeline.register(a.accumulators())
+            results = pipeline.run(issues)
+
+            ca.run(results)
+            rra.run(results)
+            cta.run(results)
+            la.run(results)
+
+        # Charts queued in headless mode are rendered together before export
+        get_renderer().render_all()
 
         # Merge results for the unified PDF
         combined_report = cta.report_data.copy()
@@ -140,5 +177,38 @@ if __name__ == "__main__":
         )
         print("\n✅ Combined Analysis Report Generated as combined_analysis_report.pdf")
 
+    elif feature == 6:
+        print("\n📈 Running Trend Analysis...")
+        analyzer = TrendAnalyzer()
+        analyzer.run()
+        get_renderer().render_all()
+        print("\n✅ Trend Analysis Complete.")
+
+    else:
+        print("⚠️ Invalid feature selected (choose 1–6).")
+
+
+if __name__ == "__main__":
+    # Interactive or non-interactive mode; command-line arguments imply
+    # non-interactive mode so that batch runs never block on stdin
+    mode = "n" if len(sys.argv) > 1 else input("Run in interactive mode? (y/n): ").strip().lower()
+
+    if mode == "y":
+        args_dict = interactive_mode()
+        args = argparse.Namespace(**args_dict)
     else:
-        print("⚠️ Invalid feature selected (choose 1–5).")
+        args = parse_args()
+    # Filters are read from the config by the DataLoader
+    config.overwrite_from_args(args)
+
+    issue_filter = IssueFilter.from_config()
+    if not issue_filter.is_empty():
+        print(f"\n🔎 Filtering issues: {issue_filter}")
+
+    # Stages are recorded while the feature runs when --profile is given
+    profile = profiler.get_profiler()
+    profile.start()
+    try:
+        run_feature(args.feature)
+    finally:
+        profile.finish()
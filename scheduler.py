@@ -0,0 +1,99 @@
+"""
+Concurrent execution of independent analyzers for the combined report.
+
+After the shared single pass over the issues, every accumulator result
+is finalized in its own thread. CPU-bound finalizers, such as sentiment
+scoring, hand their work to process pools. Each analyzer then runs in a
+thread as soon as the results it needs are ready. Its charts are
+rendered by the ChartRenderer's process pool while other analyzers keep
+working. The console output of each thread is captured and printed in a
+fixed order, so the output, report data and chart order are the same as
+in a sequential run.
+"""
+
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from aggregation import AggregationPipeline
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """
+    Stands in for sys.stdout and sends writes of threads that are being
+    captured to their own buffer.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _captured(stdout:_ThreadLocalStdout, fn, *args) -> str:
+    """
+    Runs fn in the current thread and returns everything it printed.
+    """
+    stdout.local.buffer = io.StringIO()
+    try:
+        fn(*args)
+        return stdout.local.buffer.getvalue()
+    finally:
+        stdout.local.buffer = None
+
+
+def run_analyzers(analyzers:List, issues) -> None:
+    """
+    Aggregates the issues for all analyzers in one pass and runs the
+    analyzers concurrently. Analyzers must not read from stdin or show
+    chart windows, i.e. this is meant for batch mode.
+    """
+    pipeline = AggregationPipeline()
+    needed:List[List[str]] = []
+    for analyzer in analyzers:
+        accumulators = analyzer.accumulators()
+        needed.append(list(accumulators.keys()))
+        pipeline.register(accumulators)
+    pipeline.feed(issues)
+
+    stdout = _ThreadLocalStdout(sys.stdout)
+    results:Dict[str, any] = {}
+    finalizer_output:Dict[str, str] = {}
+
+    def finalize(name):
+        finalizer_output[name] = _captured(stdout, lambda: results.__setitem__(name, pipeline.finalize(name)))
+
+    # One thread per finalizer and per analyzer, so waiting analyzers never
+    # keep a finalizer from running
+    workers = len(pipeline.accumulators) + len(analyzers)
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            finalizers = {name: executor.submit(finalize, name) for name in pipeline.accumulators}
+
+            def run_analyzer(analyzer, names):
+                for name in names:
+                    finalizers[name].result()
+                return _captured(stdout, analyzer.run, {name: results[name] for name in names})
+
+            runs = [executor.submit(run_analyzer, analyzer, names)
+                    for analyzer, names in zip(analyzers, needed)]
+            outputs = [run.result() for run in runs]
+    finally:
+        sys.stdout = stdout.stream
+
+    printed = set()
+    for names, output in zip(needed, outputs):
+        for name in names:
+            if name not in printed:
+                printed.add(name)
+                sys.stdout.write(finalizer_output.get(name, ''))
+        sys.stdout.write(output)
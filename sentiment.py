@@ -0,0 +1,104 @@
+"""
+Sentiment scoring of issue texts with TextBlob. Texts are split into
+chunks that are scored in parallel by a process pool; results are
+returned in input order, so they do not depend on the number of workers.
+Scores can be looked up in and saved to a SentimentCache so that only
+new texts are scored.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+from textblob import TextBlob
+
+import config
+import profiler
+from sentiment_cache import SentimentCache, text_key
+
+# Below this many texts, starting worker processes costs more than it saves
+_MIN_PARALLEL_TEXTS:int = 200
+
+# Chunks per worker; more chunks balance uneven text lengths better
+_CHUNKS_PER_WORKER:int = 4
+
+
+def score_text(text:str) -> Tuple[float, float]:
+    """
+    Polarity in [-1, 1] and subjectivity in [0, 1] of a text; (0, 0) if
+    it cannot be scored.
+    """
+    try:
+        s = TextBlob(text or "").sentiment
+        return (s.polarity, s.subjectivity)
+    except Exception:
+        return (0, 0)
+
+
+def _score_chunk(texts:List[str]) -> List[Tuple[float, float]]:
+    return [score_text(text) for text in texts]
+
+
+def _score_parallel(texts:List[str], workers:int) -> List[Tuple[float, float]]:
+    if workers <= 1 or len(texts) < _MIN_PARALLEL_TEXTS:
+        return _score_chunk(texts)
+    chunk_size = -(-len(texts) // (workers * _CHUNKS_PER_WORKER))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    scores = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields in submission order, which keeps results deterministic
+        for chunk_scores in executor.map(_score_chunk, chunks):
+            scores.extend(chunk_scores)
+    return scores
+
+
+def score_texts(texts:List[str], workers:int=None, cache:SentimentCache=None) -> List[Tuple[float, float]]:
+    """
+    Returns (polarity, subjectivity) for all texts in the same order as
+    the texts. Cached scores are reused; the remaining texts are scored,
+    in parallel if there are enough of them, and added to the cache.
+    """
+    workers = workers or config.get_worker_count()
+    if cache is None:
+        with profiler.stage('sentiment') as stage:
+            stage.count(len(texts))
+            return _score_parallel(texts, workers)
+
+    keys = [text_key(text or "") for text in texts]
+    cached = cache.get_many(keys)
+    # Score each distinct missing text once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+    if missing:
+        with profiler.stage('sentiment') as stage:
+            stage.count(len(missing))
+            new_scores = dict(zip(missing.keys(), _score_parallel(list(missing.values()), workers)))
+        cache.put_many(new_scores.items())
+        cached.update(new_scores)
+    return [cached[key] for key in keys]
+
+
+def score_polarities(texts:List[str], workers:int=None, cache:SentimentCache=None) -> List[float]:
+    """
+    Like score_texts(), but only returns the polarities.
+    """
+    return [polarity for polarity, _ in score_texts(texts, workers, cache)]
+
+
+def categorize(polarity:float) -> str:
+    if polarity > 0.1:
+        return "Positive"
+    elif polarity < -0.1:
+        return "Negative"
+    return "Neutral"
+
+
+def summarize(polarities:Iterable[float]) -> Dict[str, int]:
+    """
+    Counts polarities per sentiment category.
+    """
+    cats = {"Positive": 0, "Neutral": 0, "Negative": 0}
+    for polarity in polarities:
+        cats[categorize(polarity)] += 1
+    return cats
@@ -0,0 +1,119 @@
+"""
+Persistent cache of sentiment scores in a local SQLite database, keyed
+by a hash of the scored text. Issue texts rarely change between
+snapshots, so after the first run only new or edited issues need to be
+scored. The cache is bounded; the least recently used entries are
+evicted first.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+
+# Changes whenever the scoring method changes, so old scores are not reused
+SCORER_VERSION:str = 'textblob-1'
+
+DEFAULT_MAX_ENTRIES:int = 1_000_000
+
+# Stay below SQLite's limit on the number of query parameters
+_BATCH_SIZE:int = 500
+
+
+def text_key(text:str) -> str:
+    """
+    Cache key of a text.
+    """
+    return hashlib.sha1(f'{SCORER_VERSION}\0{text}'.encode('utf-8')).hexdigest()
+
+
+class SentimentCache:
+    """
+    Maps text keys to (polarity, subjectivity). Counts hits and misses of
+    the lookups made through this instance.
+    """
+
+    def __init__(self, path:str, max_entries:int=DEFAULT_MAX_ENTRIES):
+        self.path:str = path
+        self.max_entries:int = max_entries
+        self.hits:int = 0
+        self.misses:int = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores ('
+            ' key TEXT PRIMARY KEY,'
+            ' polarity REAL NOT NULL,'
+            ' subjectivity REAL NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)')
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls) -> Optional['SentimentCache']:
+        """
+        Opens the cache configured through ENPM611_PROJECT_SENTIMENT_CACHE
+        (a path, or false to disable). By default the cache is stored in
+        the directory of the data file, unless caching is disabled as a
+        whole through ENPM611_PROJECT_CACHE. Returns None if it is disabled.
+        """
+        path = config.get_parameter('ENPM611_PROJECT_SENTIMENT_CACHE', True)
+        if path is False:
+            return None
+        if path is True:
+            if not config.get_parameter('ENPM611_PROJECT_CACHE', True):
+                return None
+            data_path = config.get_parameter('ENPM611_PROJECT_DATA_PATH') or ''
+            path = os.path.join(os.path.dirname(data_path), 'sentiment_cache.sqlite')
+        max_entries = config.get_parameter('ENPM611_PROJECT_SENTIMENT_CACHE_SIZE', DEFAULT_MAX_ENTRIES)
+        try:
+            return cls(path, int(max_entries))
+        except sqlite3.Error as e:
+            print(f"Warning: Could not open sentiment cache {path}: {e}")
+            return None
+
+    def get_many(self, keys:List[str]) -> Dict[str, Tuple[float, float]]:
+        """
+        Returns the cached scores of the given keys that are present.
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), _BATCH_SIZE):
+            batch = unique_keys[i:i + _BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows = self._conn.execute(
+                f'SELECT key, polarity, subjectivity FROM scores WHERE key IN ({placeholders})', batch)
+            for key, polarity, subjectivity in rows:
+                found[key] = (polarity, subjectivity)
+        now = time.time()
+        self._conn.executemany('UPDATE scores SET last_used = ? WHERE key = ?',
+                               [(now, key) for key in found])
+        self._conn.commit()
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items:Iterable[Tuple[str, Tuple[float, float]]]):
+        """
+        Stores scores and evicts the least recently used entries if the
+        cache grew beyond its maximum size.
+        """
+        now = time.time()
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO scores (key, polarity, subjectivity, last_used) VALUES (?, ?, ?, ?)',
+            [(key, polarity, subjectivity, now) for key, (polarity, subjectivity) in items])
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM scores WHERE key IN '
+                '(SELECT key FROM scores ORDER BY last_used LIMIT ?)', (excess,))
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
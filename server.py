@@ -0,0 +1,181 @@
+"""
+Long-running analysis server. Loads the dataset once, keeps the issue
+index and columnar views warm in memory and answers analyzer queries as
+JSON over HTTP on localhost:
+
+    GET /contributors                 active issues per contributor
+    GET /contributors/<name>          summary of one contributor
+    GET /response-times               response, resolution and triage time statistics
+    GET /labels                       kind/*, area/* and prefix label counts
+    GET /trends?granularity=month     opened/closed issues, response times, labels and
+                                      sentiment per day, week or month
+
+Every endpoint accepts the start_date, end_date, label and state query
+parameters, with the same meaning as the run.py filters. Start with
+
+    python server.py --port 8611
+"""
+
+import argparse
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from aggregation import AggregationPipeline
+from contributor_activity_analyzer import ContributorActivityAnalyzer
+from data_loader import DataLoader
+from issue_filter import IssueFilter
+from label_analyzer import LabelAnalyzer
+from response_resolution_analyzer import ResponseResolutionAnalyzer
+from rollups import GRANULARITIES
+from trend_analyzer import TrendAnalyzer
+
+
+class QueryError(Exception):
+    """
+    A request that cannot be answered, with the HTTP status to send.
+    """
+
+    def __init__(self, status:HTTPStatus, message:str):
+        super().__init__(message)
+        self.status = status
+
+
+def _get_filter(params:dict) -> IssueFilter:
+    try:
+        return IssueFilter(
+            start_date=params.get('start_date'),
+            end_date=params.get('end_date'),
+            label=params.get('label'),
+            state=params.get('state'),
+        )
+    except ValueError as e:
+        raise QueryError(HTTPStatus.BAD_REQUEST, str(e))
+
+
+def query_contributors(issue_filter:IssueFilter) -> dict:
+    frames = DataLoader().get_frames(issue_filter)
+    return {
+        'issues': len(frames),
+        'active_issues': ContributorActivityAnalyzer.get_active_issues_count_per_contributor(frames),
+    }
+
+
+def query_contributor(issue_filter:IssueFilter, name:str) -> dict:
+    frames = DataLoader().get_frames(issue_filter)
+    index = ContributorActivityAnalyzer.build_contributor_index(
+        ContributorActivityAnalyzer.get_active_issues_count_per_contributor(frames),
+        ContributorActivityAnalyzer.get_issue_type_distribution_per_contributor(frames),
+    )
+    summary = index.get(name.lower())
+    if summary is None:
+        raise QueryError(HTTPStatus.NOT_FOUND, f"No data found for contributor '{name}'")
+    return summary
+
+
+def query_response_times(issue_filter:IssueFilter) -> dict:
+    analyzer = ResponseResolutionAnalyzer()
+    issues = DataLoader().get_filtered_issues(issue_filter)
+    frames = DataLoader().get_frames(issue_filter)
+    times = AggregationPipeline(analyzer.time_accumulators()).run(issues)
+    return {
+        'issues': len(issues),
+        'response_time': analyzer.summarize_times(times['first_response_times']),
+        'resolution_time': analyzer.summarize_times(analyzer.get_resolution_times(frames)),
+        'first_label_time': analyzer.summarize_times(times['first_label_times']),
+        'maintainer_response_time': analyzer.summarize_times(times['maintainer_response_times']),
+    }
+
+
+def query_labels(issue_filter:IssueFilter) -> dict:
+    analyzer = LabelAnalyzer()
+    frames = DataLoader().get_frames(issue_filter)
+    return {
+        'issues': len(frames),
+        'kind': dict(analyzer.analyze_kind_labels(frames)),
+        'area': dict(analyzer.analyze_area_labels(frames)),
+        'prefix': dict(analyzer.analyze_label_prefixes(frames)),
+    }
+
+
+def query_trends(issue_filter:IssueFilter, granularity:str) -> dict:
+    if granularity not in GRANULARITIES:
+        raise QueryError(HTTPStatus.BAD_REQUEST,
+                         f"Invalid granularity '{granularity}' (expected one of {', '.join(GRANULARITIES)})")
+    rollups = TrendAnalyzer.get_rollups(issue_filter)
+    periods = rollups.rollup(granularity, issue_filter.start_date, issue_filter.end_bound)
+    return {
+        'granularity': granularity,
+        'periods': {period: TrendAnalyzer.summarize_bucket(bucket) for period, bucket in periods.items()},
+        'total': TrendAnalyzer.summarize_bucket(rollups.query(issue_filter.start_date, issue_filter.end_bound)),
+    }
+
+
+def handle_query(path:str, params:dict) -> dict:
+    """
+    Answers a request path with the filters given as query parameters.
+    """
+    issue_filter = _get_filter(params)
+    parts = [unquote(p) for p in path.strip('/').split('/') if p]
+    if parts == ['contributors']:
+        result = query_contributors(issue_filter)
+    elif len(parts) == 2 and parts[0] == 'contributors':
+        result = query_contributor(issue_filter, parts[1])
+    elif parts == ['response-times']:
+        result = query_response_times(issue_filter)
+    elif parts == ['labels']:
+        result = query_labels(issue_filter)
+    elif parts == ['trends']:
+        result = query_trends(issue_filter, params.get('granularity', 'month'))
+    else:
+        raise QueryError(HTTPStatus.NOT_FOUND, f"Unknown endpoint '{path}'")
+    result['filter'] = str(issue_filter)
+    return result
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            status, body = HTTPStatus.OK, handle_query(url.path, params)
+        except QueryError as e:
+            status, body = e.status, {'error': str(e)}
+        except Exception as e:
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f'{type(e).__name__}: {e}'}
+        payload = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(host:str='127.0.0.1', port:int=8611):
+    """
+    Loads the dataset and serves queries until interrupted.
+    """
+    loader = DataLoader()
+    loader.get_issues()
+    # Warm the unfiltered columnar view, which most queries start from
+    loader.get_frames(IssueFilter())
+    server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+    print(f'🌐 Serving analysis queries on http://{host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser("server.py")
+    ap.add_argument('--host', type=str, default='127.0.0.1',
+                    help='Interface to listen on (default: localhost only)')
+    ap.add_argument('--port', type=int, default=8611,
+                    help='Port to listen on')
+    args = ap.parse_args()
+    serve(args.host, args.port)
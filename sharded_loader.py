@@ -0,0 +1,180 @@
+"""
+Sharded issue data and its parallel loading. Besides a single JSON file
+holding an array of issues, the data path can be
+
+- a JSONL file with one issue per line, or
+- a directory of .json (array) and .jsonl shards, read in name order.
+
+Shards are parsed by a process pool. Large JSONL files are additionally
+split into byte ranges at line boundaries, so even a single file is
+spread over all workers. The parts are merged in input order, so the
+issues are the same, in the same order, as when loading in a single
+process. Workers send their issues back column by column (one list per
+Issue slot, with the events still in their compact raw form, see
+model.Issue) rather than as objects, which is faster to pickle and
+unpickle.
+
+A JSON array file can be turned into JSONL shards with
+
+    python sharded_loader.py --data data/poetry_issues_all.json --out data/poetry_issues_all --shards 8
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+import timestamps
+from json_stream import iter_json_array
+from model import Issue
+
+SHARD_EXTENSIONS:Tuple[str, ...] = ('.json', '.jsonl')
+
+# JSONL files smaller than this are not split into byte ranges
+_MIN_SPLIT_BYTES:int = 1 << 22
+
+# Byte ranges per worker; more ranges balance uneven issue sizes better
+_RANGES_PER_WORKER:int = 4
+
+# A part of the input: a file and, for JSONL files, the byte range of
+# the lines starting in it (None for the whole file)
+Task = Tuple[str, int, Optional[int]]
+
+
+def is_sharded(path:str) -> bool:
+    """
+    Whether the data path is JSONL or a directory of shards rather than a
+    single JSON array file.
+    """
+    return _is_jsonl(path) or os.path.isdir(path)
+
+
+def _is_jsonl(path:str) -> bool:
+    return path.endswith('.jsonl')
+
+
+def list_shards(path:str) -> List[str]:
+    """
+    The files of the data path in the order their issues are read.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.endswith(SHARD_EXTENSIONS) and os.path.isfile(os.path.join(path, name))]
+
+
+def iter_records(path:str) -> Iterator[dict]:
+    """
+    Yields the raw JSON objects of all issues of a data file, JSONL file
+    or shard directory, one at a time.
+    """
+    for shard in list_shards(path):
+        yield from _iter_task((shard, 0, None))
+
+
+def _iter_task(task:Task) -> Iterator[dict]:
+    path, start, end = task
+    if not _is_jsonl(path):
+        with open(path, 'r') as fin:
+            yield from iter_json_array(fin)
+        return
+    with open(path, 'rb') as fin:
+        if start:
+            # A line belongs to the range it starts in; skip the rest of
+            # the line that started before this range
+            fin.seek(start - 1)
+            fin.readline()
+        while end is None or fin.tell() < end:
+            line = fin.readline()
+            if not line:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def get_tasks(path:str, workers:int) -> List[Task]:
+    """
+    Splits the data path into parts for the given number of workers.
+    """
+    tasks = []
+    for shard in list_shards(path):
+        size = os.path.getsize(shard)
+        if workers <= 1 or not _is_jsonl(shard) or size < _MIN_SPLIT_BYTES:
+            tasks.append((shard, 0, None))
+            continue
+        step = -(-size // (workers * _RANGES_PER_WORKER))
+        tasks.extend((shard, start, min(start + step, size)) for start in range(0, size, step))
+    return tasks
+
+
+def _to_columns(issues:List[Issue]) -> List[list]:
+    return [[getattr(issue, slot) for issue in issues] for slot in Issue.__slots__]
+
+
+def _from_columns(columns:List[list]) -> List[Issue]:
+    issues = [Issue.__new__(Issue) for _ in columns[0]]
+    for slot, values in zip(Issue.__slots__, columns):
+        set_slot = getattr(Issue, slot).__set__
+        for issue, value in zip(issues, values):
+            set_slot(issue, value)
+    return issues
+
+
+def _load_task(task:Task) -> Tuple[List[list], dict]:
+    # Timestamp statistics are counted per worker process and merged
+    timestamps.stats.reset()
+    issues = [Issue(jobj) for jobj in _iter_task(task)]
+    return _to_columns(issues), timestamps.stats.to_dict()
+
+
+def load_issues(path:str, workers:int) -> List[Issue]:
+    """
+    Loads all issues of a JSONL file or shard directory, with a process
+    pool if there is more than one worker and part.
+    """
+    tasks = get_tasks(path, workers)
+    if workers <= 1 or len(tasks) <= 1:
+        return [Issue(jobj) for task in tasks for jobj in _iter_task(task)]
+    issues = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields in submission order, which keeps the issue order
+        for columns, stats in executor.map(_load_task, tasks):
+            issues.extend(_from_columns(columns))
+            for name, count in stats.items():
+                setattr(timestamps.stats, name, getattr(timestamps.stats, name) + count)
+    return issues
+
+
+def write_shards(data_path:str, out_path:str, shards:int=1):
+    """
+    Writes the issues of a data file as JSONL: to out_path.jsonl, or to
+    a directory of that many numbered shards. The issues are streamed
+    (twice: once to count them, once to write them), so the data file
+    never has to fit into memory.
+    """
+    if shards <= 1:
+        paths = [out_path if _is_jsonl(out_path) else out_path + '.jsonl']
+    else:
+        os.makedirs(out_path, exist_ok=True)
+        paths = [os.path.join(out_path, f'part-{i:05d}.jsonl') for i in range(shards)]
+    count = sum(1 for _ in iter_records(data_path))
+    per_shard = max(1, -(-count // len(paths)))
+    records = iter_records(data_path)
+    for i, path in enumerate(paths):
+        with open(path, 'w') as fout:
+            for jobj in islice(records, per_shard):
+                fout.write(json.dumps(jobj))
+                fout.write('\n')
+    print(f'💾 Wrote {count} issues to {len(paths)} JSONL file(s) in {out_path}')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser("sharded_loader.py")
+    ap.add_argument('--data', type=str, required=True, help='Data file (or shards) to convert')
+    ap.add_argument('--out', type=str, required=True,
+                    help='JSONL file to write, or directory of shards with --shards')
+    ap.add_argument('--shards', type=int, default=1, help='Number of JSONL shards to write')
+    args = ap.parse_args()
+    write_shards(args.data, args.out, args.shards)
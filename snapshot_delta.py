@@ -0,0 +1,270 @@
+"""
+Incremental (delta) ingestion of issue snapshots.
+
+The aggregates the analyzers report on (active issues and issue types
+per contributor, label counts, response/resolution times and sentiment)
+are persisted together with each issue's contribution to them. When a
+new snapshot of the data file arrives, only issues that are new, whose
+updated_date changed, or that were deleted are processed: their old
+contribution is subtracted and the new one added. Unchanged issues are
+never turned into Issue objects and their texts are never scored again.
+
+The persisted aggregates always describe the complete, unfiltered
+snapshot. run.py --delta reports features 1, 2 and 4 from them.
+"""
+
+import os
+import pickle
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sentiment
+from event_index import TRIAGE_EVENT_TYPES, hours_between
+from model import Issue
+from sentiment_cache import SentimentCache
+
+# Bump whenever the layout of the persisted state changes
+STATE_VERSION:int = 3
+
+
+class IssueContribution:
+    """
+    What one issue adds to the aggregates.
+    """
+
+    __slots__ = ('updated', 'active', 'kinds', 'labels', 'response_time',
+                 'resolution_time', 'label_time', 'creator', 'triagers', 'comments', 'polarity')
+
+    def __init__(self, issue:Issue, updated:str):
+        # Raw updated_date string of the snapshot the issue was read from
+        self.updated:str = updated
+        logins = [assignee['login'] for assignee in issue.assignees]
+        self.active:Tuple[str, ...] = tuple(logins) if issue.state == 'open' else ()
+        kinds = [label.split('/')[1] for label in issue.labels if label.startswith('kind/')]
+        self.kinds:Tuple[Tuple[str, str], ...] = tuple((login, kind) for login in logins for kind in kinds)
+        self.labels:Tuple[str, ...] = tuple(issue.labels)
+        self.response_time:Optional[float] = _first_response_hours(issue)
+        self.resolution_time:Optional[float] = _resolution_hours(issue)
+        self.label_time:Optional[float] = hours_between(issue.created_date, issue.event_index.first_label)
+        # For maintainer response times, which depend on who triaged any
+        # issue: the people who triaged this one and its comments as
+        # (author, hours since creation), oldest first. Issues without a
+        # creation date count for neither.
+        index = issue.event_index
+        self.creator:str = issue.creator
+        self.triagers:Tuple[str, ...] = ()
+        self.comments:Tuple[Tuple[str, float], ...] = ()
+        if issue.created_date is not None:
+            self.triagers = tuple({event.author for event_type in TRIAGE_EVENT_TYPES
+                                   for event in index.of_type(event_type)
+                                   if event.author and event.author != issue.creator})
+            self.comments = tuple((event.author, hours_between(issue.created_date, event.event_date))
+                                  for event in index.of_type('commented'))
+        # Scored in one batch for all changed issues, see apply()
+        self.polarity:float = None
+
+
+def _first_response_hours(issue:Issue) -> Optional[float]:
+    return hours_between(issue.created_date, issue.event_index.first_comment)
+
+
+def _resolution_hours(issue:Issue) -> Optional[float]:
+    if issue.state != 'closed':
+        return None
+    return hours_between(issue.created_date, issue.event_index.closed or issue.updated_date)
+
+
+class SnapshotDelta:
+    """
+    Issue numbers that were new, changed or deleted in a snapshot.
+    """
+
+    def __init__(self):
+        self.new:List[int] = []
+        self.changed:List[int] = []
+        self.deleted:List[int] = []
+
+    def __str__(self) -> str:
+        return f'{len(self.new)} new, {len(self.changed)} changed, {len(self.deleted)} deleted'
+
+
+class SnapshotAggregates:
+    """
+    Aggregates over all issues of the last ingested snapshot, in the
+    same shapes the analyzers report them.
+    """
+
+    def __init__(self):
+        self.contributions:Dict[int, IssueContribution] = {}
+        self.active_counts:Counter = Counter()
+        self.type_distribution:Dict[str, Counter] = {}
+        self.label_counts:Counter = Counter()
+        self.response_times:Dict[int, float] = {}
+        self.resolution_times:Dict[int, float] = {}
+        self.first_label_times:Dict[int, float] = {}
+        self.sentiment_scores:Dict[int, float] = {}
+
+    def apply(self, jobjs:Iterable[dict]) -> SnapshotDelta:
+        """
+        Brings the aggregates up to date with a snapshot, given as the
+        raw JSON objects of all its issues, and returns what changed.
+        """
+        delta = SnapshotDelta()
+        seen = set()
+        changed:List[Tuple[int, IssueContribution, Issue]] = []
+        for jobj in jobjs:
+            try:
+                number = int(jobj.get('number', '-1'))
+            except (TypeError, ValueError):
+                number = -1
+            seen.add(number)
+            updated = jobj.get('updated_date')
+            old = self.contributions.get(number)
+            if old is not None and old.updated == updated:
+                continue
+            issue = Issue(jobj)
+            changed.append((number, IssueContribution(issue, updated), issue))
+            (delta.new if old is None else delta.changed).append(number)
+
+        delta.deleted = [number for number in self.contributions if number not in seen]
+        for number in delta.deleted:
+            self._remove(number)
+
+        polarities = self._score([issue for _, _, issue in changed])
+        for (number, contribution, _), polarity in zip(changed, polarities):
+            contribution.polarity = polarity
+            self._remove(number)
+            self._add(number, contribution)
+        return delta
+
+    @staticmethod
+    def _score(issues:List[Issue]) -> List[float]:
+        if not issues:
+            return []
+        cache = SentimentCache.from_config()
+        try:
+            return sentiment.score_polarities([issue.text or "" for issue in issues], cache=cache)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def _add(self, number:int, contribution:IssueContribution):
+        self.contributions[number] = contribution
+        self.active_counts.update(contribution.active)
+        for login, kind in contribution.kinds:
+            self.type_distribution.setdefault(login, Counter())[kind] += 1
+        self.label_counts.update(contribution.labels)
+        if contribution.response_time is not None:
+            self.response_times[number] = contribution.response_time
+        if contribution.resolution_time is not None:
+            self.resolution_times[number] = contribution.resolution_time
+        if contribution.label_time is not None:
+            self.first_label_times[number] = contribution.label_time
+        self.sentiment_scores[number] = contribution.polarity
+
+    def _remove(self, number:int):
+        contribution = self.contributions.pop(number, None)
+        if contribution is None:
+            return
+        _subtract(self.active_counts, contribution.active)
+        for login, kind in contribution.kinds:
+            _subtract(self.type_distribution[login], [kind])
+            if not self.type_distribution[login]:
+                del self.type_distribution[login]
+        _subtract(self.label_counts, contribution.labels)
+        self.response_times.pop(number, None)
+        self.resolution_times.pop(number, None)
+        self.first_label_times.pop(number, None)
+        self.sentiment_scores.pop(number, None)
+
+    def active_issues_per_contributor(self) -> Dict[str, int]:
+        return dict(self.active_counts)
+
+    def issue_type_distribution(self) -> Dict[str, Dict[str, int]]:
+        return {login: dict(kinds) for login, kinds in self.type_distribution.items()}
+
+    def maintainer_response_times(self, maintainers:Iterable[str]=None) -> Dict[int, float]:
+        """
+        Hours to the first comment by a maintainer other than the issue's
+        creator, as in MaintainerResponseTimeAccumulator. Maintainers
+        default to everyone who triaged someone else's issue.
+        """
+        if maintainers:
+            maintainers = set(maintainers)
+        else:
+            maintainers = {login for c in self.contributions.values() for login in c.triagers}
+        times = {}
+        for number, contribution in self.contributions.items():
+            for author, hours in contribution.comments:
+                if author in maintainers and author != contribution.creator:
+                    times[number] = hours
+                    break
+        return times
+
+    def labels_with_prefix(self, prefix:str) -> Dict[str, int]:
+        return {label: count for label, count in self.label_counts.items() if label.startswith(prefix)}
+
+    def label_prefixes(self) -> Dict[str, int]:
+        prefixes = Counter()
+        for label, count in self.label_counts.items():
+            if '/' in label:
+                prefixes[label.split('/')[0]] += count
+        return dict(prefixes)
+
+
+def _subtract(counter:Counter, keys:Iterable[str]):
+    # Keys are dropped at zero so the aggregates equal a full rebuild
+    for key in keys:
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+
+def get_state_path(data_path:str) -> str:
+    """
+    Returns the default path of the persisted aggregates of a data file.
+    """
+    return data_path + '.state'
+
+
+def load_state(state_path:str) -> Optional[SnapshotAggregates]:
+    """
+    Returns the persisted aggregates, or None if there are none or they
+    were written by an incompatible version.
+    """
+    if not os.path.isfile(state_path):
+        return None
+    try:
+        with open(state_path, 'rb') as fin:
+            if pickle.load(fin) != STATE_VERSION:
+                return None
+            return pickle.load(fin)
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable snapshot state {state_path}: {e}")
+        return None
+
+
+def save_state(state_path:str, aggregates:SnapshotAggregates):
+    """
+    Persists the aggregates. The file is replaced atomically so an
+    interrupted refresh never leaves a partial state behind.
+    """
+    tmp_path = f'{state_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fout:
+            pickle.dump(STATE_VERSION, fout, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(aggregates, fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, state_path)
+    except OSError as e:
+        print(f"Warning: Could not write snapshot state {state_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+if __name__ == '__main__':
+    # Nightly refresh: ingest the configured data file as a delta
+    from data_loader import DataLoader
+    delta, aggregates = DataLoader().load_delta()
+    print(f"Issues tracked: {len(aggregates.contributions)}")
+    print(f"Contributors with active issues: {len(aggregates.active_counts)}")
+    print(f"Sentiment: {sentiment.summarize(aggregates.sentiment_scores.values())}")
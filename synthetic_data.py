@@ -0,0 +1,178 @@
+"""
+Generates synthetic GitHub issue datasets in the same JSON shape as the
+real data file (see model.Issue.from_json), for benchmarks at sizes the
+real dataset does not reach. Run with e.g.
+
+    python synthetic_data.py --issues 100000 --out data/synthetic_100k.json
+
+The output only depends on the parameters and the seed, so benchmark
+runs on different machines or commits see the same data.
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+
+LABELS:List[str] = [
+    'kind/bug', 'kind/feature', 'kind/question', 'kind/enhancement', 'kind/documentation',
+    'area/installer', 'area/solver', 'area/cli', 'area/config', 'area/packaging', 'area/venv',
+    'status/triage', 'status/confirmed', 'status/duplicate', 'status/wontfix',
+    'good first issue', 'help wanted',
+]
+
+EVENT_TYPES:List[str] = [
+    'commented', 'commented', 'commented', 'labeled', 'unlabeled', 'assigned',
+    'mentioned', 'subscribed', 'referenced', 'cross-referenced', 'renamed',
+]
+
+WORDS:List[str] = (
+    'poetry install lock update dependency version resolve solver package virtualenv '
+    'environment python pyproject toml build publish wheel source repository cache '
+    'works fails expected behavior actual steps reproduce thanks please help great '
+    'broken slow issue problem fix workaround latest release upgrade downgrade plugin'
+).split()
+
+ERROR_LINES:List[str] = [
+    'Error: Unable to find installation candidates',
+    'SolverProblemError: Because no versions of the package match',
+    'RuntimeError: The lock file is not compatible with the current version',
+    'KeyError: Exception raised while resolving dependencies',
+]
+
+_START = datetime(2018, 1, 1, tzinfo=timezone.utc)
+_SPAN_HOURS = 6 * 365 * 24
+
+
+class SyntheticDataset:
+    """
+    Parameters of a synthetic dataset.
+
+    Assignees and creators follow a Zipf-like distribution over the
+    contributors, so a few contributors own most issues as in real
+    projects. Event counts are exponentially distributed around
+    events_per_issue and body lengths around body_words.
+    """
+
+    def __init__(self, issues:int=10000, events_per_issue:float=6.0, labels:List[str]=None,
+                 labels_per_issue:int=3, contributors:int=500, max_assignees:int=2,
+                 zipf_exponent:float=1.1, body_words:int=80, error_rate:float=0.3,
+                 closed_rate:float=0.7, seed:int=611):
+        self.issues:int = issues
+        self.events_per_issue:float = events_per_issue
+        self.labels:List[str] = labels or LABELS
+        self.labels_per_issue:int = labels_per_issue
+        self.contributors:int = contributors
+        self.max_assignees:int = max_assignees
+        self.zipf_exponent:float = zipf_exponent
+        self.body_words:int = body_words
+        self.error_rate:float = error_rate
+        self.closed_rate:float = closed_rate
+        self.seed:int = seed
+
+    def to_dict(self) -> Dict[str, any]:
+        return dict(vars(self))
+
+    def iter_issues(self) -> Iterator[dict]:
+        """
+        Yields the issues as JSON objects, one at a time.
+        """
+        rng = random.Random(self.seed)
+        users = [f'contributor{i}' for i in range(self.contributors)]
+        weights = [1 / (rank + 1) ** self.zipf_exponent for rank in range(self.contributors)]
+        cum_weights = [0.0] * self.contributors
+        total = 0.0
+        for i, weight in enumerate(weights):
+            total += weight
+            cum_weights[i] = total
+
+        def user():
+            return rng.choices(users, cum_weights=cum_weights)[0]
+
+        for number in range(1, self.issues + 1):
+            created = _START + timedelta(hours=rng.random() * _SPAN_HOURS)
+            labels = rng.sample(self.labels, rng.randint(0, min(self.labels_per_issue, len(self.labels))))
+            assignees = {user() for _ in range(rng.randint(0, self.max_assignees))}
+
+            events = []
+            when = created
+            for _ in range(int(rng.expovariate(1 / self.events_per_issue)) if self.events_per_issue else 0):
+                when += timedelta(minutes=rng.randint(1, 7 * 24 * 60))
+                event_type = rng.choice(EVENT_TYPES)
+                events.append({
+                    'event_type': event_type,
+                    'author': user(),
+                    'event_date': _format(when),
+                    'label': rng.choice(self.labels) if event_type in ('labeled', 'unlabeled') else None,
+                    'comment': self._text(rng, 20) if event_type == 'commented' else None,
+                })
+            closed = rng.random() < self.closed_rate
+            if closed:
+                when += timedelta(minutes=rng.randint(1, 30 * 24 * 60))
+                events.append({'event_type': 'closed', 'author': user(), 'event_date': _format(when),
+                               'label': None, 'comment': None})
+
+            yield {
+                'url': f'https://github.com/python-poetry/poetry/issues/{number}',
+                'creator': user(),
+                'labels': labels,
+                'state': 'closed' if closed else 'open',
+                'assignees': [{'login': login} for login in sorted(assignees)],
+                'title': ' '.join(rng.choices(WORDS, k=rng.randint(3, 10))).capitalize(),
+                'text': self._text(rng, self.body_words),
+                'number': number,
+                'created_date': _format(created),
+                'updated_date': _format(when),
+                'timeline_url': f'https://api.github.com/repos/python-poetry/poetry/issues/{number}/timeline',
+                'events': events,
+            }
+
+    def _text(self, rng:random.Random, mean_words:int) -> str:
+        words = max(1, int(rng.expovariate(1 / mean_words))) if mean_words else 0
+        lines = []
+        while words > 0:
+            line = min(words, rng.randint(5, 15))
+            lines.append(' '.join(rng.choices(WORDS, k=line)))
+            words -= line
+        if rng.random() < self.error_rate:
+            lines.insert(rng.randint(0, len(lines)), rng.choice(ERROR_LINES))
+        return '\n'.join(lines)
+
+    def write(self, path:str):
+        """
+        Writes the dataset as a JSON array without holding it in memory.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as fout:
+            fout.write('[')
+            for i, jobj in enumerate(self.iter_issues()):
+                fout.write(',\n' if i else '\n')
+                json.dump(jobj, fout)
+            fout.write('\n]\n')
+
+
+def _format(value:datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser("synthetic_data.py")
+    ap.add_argument('--issues', type=int, default=10000, help='Number of issues')
+    ap.add_argument('--events', type=float, default=6.0, help='Mean number of events per issue')
+    ap.add_argument('--labels', type=str, required=False,
+                    help='Comma-separated label vocabulary (defaults to Poetry-like labels)')
+    ap.add_argument('--contributors', type=int, default=500, help='Number of distinct contributors')
+    ap.add_argument('--max_assignees', type=int, default=2, help='Maximum assignees per issue')
+    ap.add_argument('--body_words', type=int, default=80, help='Mean number of words per issue body')
+    ap.add_argument('--seed', type=int, default=611, help='Random seed')
+    ap.add_argument('--out', type=str, required=True, help='Path of the JSON file to write')
+    args = ap.parse_args()
+    dataset = SyntheticDataset(
+        issues=args.issues, events_per_issue=args.events,
+        labels=args.labels.split(',') if args.labels else None,
+        contributors=args.contributors, max_assignees=args.max_assignees,
+        body_words=args.body_words, seed=args.seed)
+    dataset.write(args.out)
+    print(f'Wrote {args.issues} synthetic issues to {args.out}')
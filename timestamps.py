@@ -0,0 +1,68 @@
+"""
+Decodes the timestamps contained in the issues JSON. GitHub always emits
+the fixed ISO-8601 form (e.g. 2023-05-01T12:34:56Z), which is decoded
+with datetime.fromisoformat. dateutil is only used as a fallback for
+inputs that are not in that form.
+"""
+
+from datetime import datetime
+from typing import Optional
+from dateutil import parser
+
+
+class TimestampStats:
+    """
+    Counts how timestamps were decoded so that unexpected formats in a
+    dataset do not go unnoticed.
+    """
+
+    def __init__(self):
+        self.fast:int = 0
+        self.fallback:int = 0
+        self.failed:int = 0
+        self.missing:int = 0
+
+    def reset(self):
+        self.__init__()
+
+    def to_dict(self) -> dict:
+        return {
+            'fast': self.fast,
+            'fallback': self.fallback,
+            'failed': self.failed,
+            'missing': self.missing,
+        }
+
+    def __str__(self):
+        return ', '.join(f'{k}: {v}' for k, v in self.to_dict().items())
+
+
+# Counters for all timestamps decoded in this process
+stats = TimestampStats()
+
+
+def parse_timestamp(value:any) -> Optional[datetime]:
+    """
+    Converts a timestamp from the issues JSON into a datetime. Returns
+    None if the value is missing or cannot be parsed.
+    """
+    if value is None:
+        stats.missing += 1
+        return None
+    try:
+        # fromisoformat only accepts the 'Z' suffix from Python 3.11 on
+        if value[-1:] == 'Z':
+            result = datetime.fromisoformat(value[:-1] + '+00:00')
+        else:
+            result = datetime.fromisoformat(value)
+        stats.fast += 1
+        return result
+    except (TypeError, ValueError):
+        pass
+    try:
+        result = parser.parse(value)
+        stats.fallback += 1
+        return result
+    except (TypeError, ValueError, OverflowError):
+        stats.failed += 1
+        return None
@@ -0,0 +1,160 @@
+import math
+from typing import Dict
+import matplotlib.pyplot as plt
+import config
+import profiler
+from aggregation import accumulate
+from chart_renderer import ChartJob, get_renderer
+from data_loader import DataLoader
+from issue_filter import IssueFilter
+from pdf_report_exporter import PDFReportExporter
+from rollups import GRANULARITIES, Bucket, RollupAccumulator, Rollups
+
+# At most this many period names are written on the x axis
+_MAX_TICKS = 24
+
+
+def _set_period_ticks(ax, periods):
+    step = max(1, -(-len(periods) // _MAX_TICKS))
+    ax.set_xticks(range(0, len(periods), step))
+    ax.set_xticklabels(periods[::step], rotation=45, ha="right")
+
+
+def _draw_opened_closed_trend(periods, opened, closed, granularity):
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(range(len(periods)), opened, marker=".", label="Opened")
+    ax.plot(range(len(periods)), closed, marker=".", label="Closed")
+    _set_period_ticks(ax, periods)
+    ax.set_title(f"Issues Opened and Closed per {granularity.capitalize()}")
+    ax.set_ylabel("Number of Issues")
+    ax.grid(axis="y", linestyle="--", alpha=0.6)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def _draw_response_time_trend(periods, p50, p90, granularity):
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(range(len(periods)), p50, marker=".", label="p50")
+    ax.plot(range(len(periods)), p90, marker=".", label="p90")
+    _set_period_ticks(ax, periods)
+    ax.set_title(f"First Response Time of Issues Opened per {granularity.capitalize()}")
+    ax.set_ylabel("Hours")
+    ax.grid(axis="y", linestyle="--", alpha=0.6)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+class TrendAnalyzer:
+    def __init__(self):
+        self.report_data = {}
+        self.chart_paths = []
+        # Size of the periods trends are reported in: day, week or month
+        self.GRANULARITY = config.get_parameter('granularity', 'month')
+        if self.GRANULARITY not in GRANULARITIES:
+            raise ValueError(f"Invalid granularity '{self.GRANULARITY}' (expected one of {', '.join(GRANULARITIES)})")
+
+    @staticmethod
+    def get_rollups(issue_filter:IssueFilter) -> Rollups:
+        """
+        Rollups to answer the filter from. Date ranges are answered by
+        summing buckets of the persisted rollups of all issues; label and
+        state filters need rollups of just the matching issues.
+        """
+        if issue_filter.label is None and issue_filter.state is None:
+            return DataLoader().get_rollups()
+        matching = IssueFilter(label=issue_filter.label, state=issue_filter.state)
+        return accumulate(RollupAccumulator(), DataLoader().get_filtered_issues(matching))
+
+    @staticmethod
+    def summarize_bucket(bucket:Bucket) -> Dict[str, any]:
+        """
+        Aggregates of a period as reported, with response times in hours.
+        """
+        response = {}
+        if bucket.response.count:
+            p50, p90 = bucket.response.quantiles([0.5, 0.9])
+            response = {"Response p50 (hrs)": round(float(p50), 2), "Response p90 (hrs)": round(float(p90), 2)}
+        top_label = bucket.labels.most_common(1)
+        return {
+            "Opened": bucket.opened,
+            "Closed": bucket.closed,
+            "Comments": bucket.comments,
+            **response,
+            "Top Label": top_label[0][0] if top_label else None,
+            "Sentiment": {k: bucket.sentiment.get(k, 0) for k in ("Positive", "Neutral", "Negative")},
+        }
+
+    def run(self):
+        """
+        Reports the trends of the issues matching the --start_date,
+        --end_date, --label and --state filters per --granularity.
+        """
+        with profiler.stage('trends'):
+            issue_filter = IssueFilter.from_config()
+            rollups = self.get_rollups(issue_filter)
+
+            with profiler.stage('trends.compute') as stage:
+                periods = rollups.rollup(self.GRANULARITY, issue_filter.start_date, issue_filter.end_bound)
+                total = rollups.query(issue_filter.start_date, issue_filter.end_bound)
+                stage.count(len(periods))
+
+            with profiler.stage('trends.report'):
+                self.print_trends(periods, total)
+            with profiler.stage('trends.plot'):
+                self.plot_trends(periods)
+
+    def print_trends(self, periods:Dict[str, Bucket], total:Bucket):
+        title = f"Trends per {self.GRANULARITY.capitalize()}"
+        print(f"\n📈 {title}:")
+        if not periods:
+            print("No data available.")
+            self.report_data[title] = {"Info": "No data available."}
+            return
+        print(f"  {'Period':<10} {'Opened':>7} {'Closed':>7} {'Comments':>9} {'Resp p50':>9} {'Resp p90':>9}  "
+              f"{'Pos/Neu/Neg':<13} Top Label")
+        rows = {}
+        for period, bucket in periods.items():
+            row = rows[period] = self.summarize_bucket(bucket)
+            p50 = row.get("Response p50 (hrs)")
+            p90 = row.get("Response p90 (hrs)")
+            sentiment = "/".join(str(v) for v in row["Sentiment"].values())
+            print(f"  {period:<10} {row['Opened']:>7} {row['Closed']:>7} {row['Comments']:>9} "
+                  f"{'-' if p50 is None else f'{p50:.1f}':>9} {'-' if p90 is None else f'{p90:.1f}':>9}  "
+                  f"{sentiment:<13} {row['Top Label'] or '-'}")
+        self.report_data[title] = rows
+
+        summary = self.summarize_bucket(total)
+        print("\n📊 Whole Range:")
+        for key, value in summary.items():
+            print(f"  {key}: {value}")
+        self.report_data["Trends: Whole Range"] = summary
+
+    def plot_trends(self, periods:Dict[str, Bucket]):
+        if not periods:
+            print("⚠️ No trends to plot.")
+            return
+        names = list(periods)
+        path = get_renderer().submit(ChartJob(
+            _draw_opened_closed_trend, f"trend_opened_closed_{self.GRANULARITY}.png", periods=names,
+            opened=[b.opened for b in periods.values()], closed=[b.closed for b in periods.values()],
+            granularity=self.GRANULARITY))
+        self.chart_paths.append(path)
+
+        # Periods without responses are left as gaps
+        quantiles = [b.response.quantiles([0.5, 0.9]) if b.response.count else [math.nan, math.nan]
+                     for b in periods.values()]
+        path = get_renderer().submit(ChartJob(
+            _draw_response_time_trend, f"trend_response_time_{self.GRANULARITY}.png", periods=names,
+            p50=[float(q[0]) for q in quantiles], p90=[float(q[1]) for q in quantiles], granularity=self.GRANULARITY))
+        self.chart_paths.append(path)
+        print(f"🖼️ Trend charts saved as trend_*_{self.GRANULARITY}.png")
+
+    def export_report_pdf(self, filename="trend_analysis_report.pdf"):
+        get_renderer().render_all()
+        PDFReportExporter("Trend Analysis Report").export(
+            self.report_data,
+            chart_paths=self.chart_paths,
+            filename=filename
+        )